@@ -0,0 +1,172 @@
+"""
+Аналитика результатов гонщиков (NumPy)
+
+Результаты нужных гонщиков читаются из курсора БД сразу в структурированный массив
+(racer_id, race_id, kart_id, duration в микросекундах), трасса и дата подставляются по гонке.
+Статистика по группам (гонщик, трасса) и (гонщик, карт) считается векторно: сортировка lexsort,
+границы групп, суммы через np.add.reduceat. Цикл на Python идет только по готовым группам при сборке ответа.
+"""
+from datetime import time
+from typing import Iterable, Sequence
+
+# NumPy импортируется при первом запросе аналитики (load), а не при запуске приложения
+np = None
+
+US = 1_000_000  # Микросекунд в секунде
+
+
+def load() -> bool:
+    """Импортировать NumPy; False - не установлен (аналитика недоступна, остальное API работает)"""
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:
+            return False
+        np = numpy
+    return True
+
+
+def group_bounds(*keys: "np.ndarray") -> tuple["np.ndarray", "np.ndarray"]:
+    """Начала и размеры групп в отсортированных по ключам массивах"""
+    size = len(keys[0])
+    change = np.zeros(size, dtype=bool)
+    change[0] = True
+    for key in keys:
+        change[1:] |= key[1:] != key[:-1]
+    starts = np.flatnonzero(change)
+    counts = np.diff(np.append(starts, size))
+    return starts, counts
+
+
+def percentile(durations: "np.ndarray", starts: "np.ndarray", counts: "np.ndarray", q: float) -> "np.ndarray":
+    """Перцентиль каждой группы (значения внутри группы отсортированы, линейная интерполяция)"""
+    position = starts + q * (counts - 1)
+    low = np.floor(position).astype(np.int64)
+    high = np.minimum(low + 1, starts + counts - 1)
+    return durations[low] + (durations[high] - durations[low]) * (position - low)
+
+
+def trend(days: "np.ndarray", dated: "np.ndarray", durations: "np.ndarray",
+          starts: "np.ndarray", counts: "np.ndarray") -> "np.ndarray":
+    """
+    Наклон линейной регрессии времени по дате гонки для каждой группы, микросекунд за день
+    Гонки без даты не учитываются. NaN, если в группе меньше двух разных дат
+    """
+    weight = dated.astype(np.float64)
+    n = np.add.reduceat(weight, starts)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x_mean = np.repeat(np.add.reduceat(days * weight, starts) / n, counts)
+        y_mean = np.repeat(np.add.reduceat(durations * weight, starts) / n, counts)
+        dx = np.where(dated, days - x_mean, 0.0)
+        dy = np.where(dated, durations - y_mean, 0.0)
+        sxx = np.add.reduceat(dx * dx, starts)
+        sxy = np.add.reduceat(dx * dy, starts)
+        return np.where(sxx > 0, sxy / sxx, np.nan)
+
+
+def to_times(values: "np.ndarray") -> list[time]:
+    """Микросекунды (массив) в список datetime.time"""
+    values = np.rint(values).astype(np.int64)
+    seconds, microseconds = np.divmod(values, US)
+    minutes, seconds = np.divmod(seconds, 60)
+    hours, minutes = np.divmod(minutes, 60)
+    return list(map(time, hours.tolist(), minutes.tolist(), seconds.tolist(), microseconds.tolist()))
+
+
+def read_results(rows: Iterable[tuple]) -> "np.ndarray":
+    """Строки (racer_id, race_id, kart_id, duration_us) в структурированный массив, без промежуточного списка"""
+    dtype = np.dtype([("racer_id", np.int64), ("race_id", np.int64), ("kart_id", np.int64), ("duration", np.int64)])
+    return np.fromiter(rows, dtype=dtype)
+
+
+def race_ids(results: "np.ndarray") -> list[int]:
+    """ID гонок, в которых есть результаты (по возрастанию, без повторов)"""
+    return np.unique(results["race_id"]).tolist()
+
+
+def racer_stats(racer_ids: Sequence[int], results: "np.ndarray", races: Sequence[tuple]) -> list[dict]:
+    """
+    Статистика гонщиков по результатам (read_results) и гонкам (race_id, track_id, race_date)
+    Возвращает словари в формате RacerStats в порядке racer_ids
+    """
+    stats = {racer_id: {"racer_id": racer_id, "races": 0, "tracks": [], "karts": []} for racer_id in racer_ids}
+    if not len(results) or not races:
+        return list(stats.values())
+
+    # Трасса и дата каждого результата - по номеру гонки в отсортированном списке гонок
+    race_col, track_col, date_col = zip(*races)
+    race = np.array(race_col, dtype=np.int64)
+    order = np.argsort(race)
+    race = race[order]
+    race_track = np.array(track_col, dtype=np.int64)[order]
+    # Дата гонки - номер дня (date.toordinal), -1 для гонок без даты
+    race_days = np.fromiter((-1 if value is None else value.toordinal() for value in date_col),
+                            dtype=np.int64, count=len(date_col))[order]
+    position = np.minimum(np.searchsorted(race, results["race_id"]), len(race) - 1)
+    found = race[position] == results["race_id"]
+    if not found.all():  # Гонку удалили между запросами результатов и гонок
+        return racer_stats(racer_ids, results[found], races)
+    racer = results["racer_id"]
+    track = race_track[position]
+    kart = results["kart_id"]
+    days = race_days[position]
+    duration = results["duration"].astype(np.float64)
+
+    # Группы (гонщик, трасса), внутри группы - по возрастанию времени
+    order = np.lexsort((duration, track, racer))
+    racer, track, kart, days, duration = racer[order], track[order], kart[order], days[order], duration[order]
+    starts, counts = group_bounds(racer, track)
+    mean = np.add.reduceat(duration, starts) / counts
+    deviation = duration - np.repeat(mean, counts)
+    stddev = np.sqrt(np.add.reduceat(deviation * deviation, starts) / counts)
+    median = percentile(duration, starts, counts, 0.5)
+    p10 = percentile(duration, starts, counts, 0.1)
+    p90 = percentile(duration, starts, counts, 0.9)
+    dated = days >= 0
+    slope = (trend(days.astype(np.float64), dated, duration, starts, counts) / US).round(4)
+    consistency = np.divide(stddev, mean, out=np.zeros_like(mean), where=mean > 0).round(4)
+
+    columns = zip(
+        racer[starts].tolist(), track[starts].tolist(), counts.tolist(),
+        to_times(duration[starts]), to_times(mean), to_times(median), to_times(p10), to_times(p90),
+        to_times(stddev), consistency.tolist(), slope.tolist()
+    )
+    for racer_id, track_id, races, best, mean_, median_, p10_, p90_, stddev_, consistency_, slope_ in columns:
+        entry = stats[racer_id]
+        entry["races"] += races
+        entry["tracks"].append({
+            "track_id": track_id,
+            "races": races,
+            "best": best,
+            "mean": mean_,
+            "median": median_,
+            "p10": p10_,
+            "p90": p90_,
+            "stddev": stddev_,
+            "consistency": consistency_,
+            "trend": None if slope_ != slope_ else slope_,  # NaN - недостаточно дат
+        })
+
+    # Группы (гонщик, карт): отклонение от среднего гонщика на той же трассе убирает
+    # разницу между трассами, и карты можно сравнивать между собой
+    order = np.lexsort((kart, racer))
+    racer, kart, duration, deviation = racer[order], kart[order], duration[order], deviation[order]
+    starts, counts = group_bounds(racer, kart)
+    kart_mean = np.add.reduceat(duration, starts) / counts
+    kart_best = np.minimum.reduceat(duration, starts)
+    kart_delta = (np.add.reduceat(deviation, starts) / counts / US).round(3)
+
+    columns = zip(
+        racer[starts].tolist(), kart[starts].tolist(), counts.tolist(),
+        to_times(kart_best), to_times(kart_mean), kart_delta.tolist()
+    )
+    for racer_id, kart_id, races, best, mean_, delta in columns:
+        stats[racer_id]["karts"].append({
+            "kart_id": kart_id,
+            "races": races,
+            "best": best,
+            "mean": mean_,
+            "delta": delta,
+        })
+    return list(stats.values())
@@ -0,0 +1,374 @@
+"""
+Асинхронные endpoints (режим DB_MODE=async)
+
+Списки и чтение по ID, результаты и история написаны на AsyncSession (request_async.py).
+Остальные endpoints с сессией БД, в том числе запись, поиск, лидерборды, /races/{id}/full,
+классификация, отчеты и обслуживание картов, при запуске заменяются асинхронными обертками
+(run_sync_endpoint): тот же код из api.py и request.py выполняется через AsyncSession.run_sync
+на соединении асинхронного драйвера, ожидание БД не занимает поток пула.
+Аналитика читает БД так же, а расчет NumPy идет в пуле потоков, чтобы не держать event loop.
+Выгрузка читает порции через session.stream. Импорт файлов остается в пуле потоков.
+"""
+import functools
+import inspect
+from datetime import date
+from typing import Callable
+
+from fastapi import APIRouter, Body, Depends, FastAPI, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from fastapi.routing import APIRoute
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from model import Karts, Tracks, Races, Racers, Workers, Race_Racer_Kart, RacerStats
+import request as sync_req
+import request_async as req
+import analytics
+import config
+import export
+from database import (
+    async_read_bind, get_async_read_session, get_async_session, get_read_session, get_session, uses_primary
+)
+from etag import not_modified
+from fastjson import rows_response
+
+
+router = APIRouter()
+
+# Синхронная сессия endpoint -> асинхронная с той же БД (основная или реплика)
+ASYNC_SESSIONS = {get_session: get_async_session, get_read_session: get_async_read_session}
+
+
+def run_sync_endpoint(endpoint: Callable) -> Callable | None:
+    """
+    Асинхронная версия синхронного endpoint с параметром session (Depends(get_session / get_read_session)):
+    те же параметры и ответ, тело выполняется через AsyncSession.run_sync
+    None - у endpoint нет такой сессии
+    """
+    signature = inspect.signature(endpoint)
+    parameter = signature.parameters.get("session")
+    dependency = getattr(parameter.default, "dependency", None) if parameter else None
+    if dependency not in ASYNC_SESSIONS:
+        return None
+
+    @functools.wraps(endpoint)
+    async def wrapper(**kwargs):
+        session = kwargs.pop("session")
+        return await session.run_sync(lambda sync_session: endpoint(session=sync_session, **kwargs))
+
+    wrapper.__signature__ = signature.replace(parameters=[
+        value.replace(annotation=AsyncSession, default=Depends(ASYNC_SESSIONS[dependency])) if name == "session"
+        else value
+        for name, value in signature.parameters.items()
+    ])
+    return wrapper
+
+
+def async_route(route: APIRoute) -> APIRoute | None:
+    """Маршрут синхронного endpoint с сессией БД, переведенный на run_sync_endpoint (None - не нужно)"""
+    if inspect.iscoroutinefunction(route.endpoint):
+        return None
+    endpoint = run_sync_endpoint(route.endpoint)
+    if endpoint is None:
+        return None
+    return APIRoute(
+        route.path, endpoint, response_model=route.response_model, status_code=route.status_code,
+        tags=route.tags, dependencies=route.dependencies, summary=route.summary,
+        description=route.description, responses=route.responses, methods=route.methods,
+        name=route.name, response_class=route.response_class, include_in_schema=route.include_in_schema,
+    )
+
+
+def use_async_routes(app: FastAPI, async_router: APIRouter):
+    """
+    Подменить endpoints приложения асинхронными версиями с тем же путем и методом,
+    остальные синхронные endpoints с сессией БД - обертками run_sync_endpoint
+    Порядок маршрутов сохраняется
+    """
+    replacements = {(route.path, frozenset(route.methods)): route for route in async_router.routes}
+    for index, route in enumerate(app.router.routes):
+        key = (getattr(route, "path", None), frozenset(getattr(route, "methods", None) or ()))
+        if key in replacements:
+            app.router.routes[index] = replacements.pop(key)
+        elif isinstance(route, APIRoute):
+            app.router.routes[index] = async_route(route) or route
+    app.router.routes.extend(replacements.values())
+
+
+# ========== CONDITIONAL GET ==========
+
+async def check_not_modified(request: Request, response: Response, session: AsyncSession,
+                             table: str) -> Response | None:
+    """ETag / Last-Modified по версии таблицы, 304 - если у клиента актуальные данные"""
+    return not_modified(request, response, await req.read_table_version(session, table))
+
+
+# ========== PAGINATION ==========
+
+async def paginate(session: AsyncSession, model: type[SQLModel], response: Response,
+                   limit: int, after: int | None):
+    """
+    Вернуть страницу записей, курсор следующей страницы кладется в заголовок X-Next-Cursor
+    """
+    read = req.read_page_rows if config.FAST_JSON else req.read_page
+    rows, next_cursor = await read(session, model, limit, after)
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = str(next_cursor)
+    if config.FAST_JSON:
+        return rows_response(rows, response)
+    return rows
+
+
+def stream_ndjson(model: type[SQLModel], bind: AsyncEngine) -> StreamingResponse:
+    """
+    Отдать всю таблицу потоком в формате NDJSON (одна запись - одна строка)
+    bind - engine сессии запроса (реплика или основная БД)
+    """
+    async def generate():
+        async with AsyncSession(bind) as session:
+            async for row in req.iter_all(session, model, config.STREAM_CHUNK_SIZE):
+                yield row.model_dump_json() + "\n"
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+
+async def list_endpoint(model: type[SQLModel], response: Response, limit: int,
+                        after: int | None, stream: bool, session: AsyncSession):
+    """Общая реализация списочных endpoints"""
+    if stream:
+        return stream_ndjson(model, session.bind)
+    return await paginate(session, model, response, limit, after)
+
+
+# ===== KARTS ENDPOINTS =====
+@router.get("/karts", response_model=list[Karts], tags=["Karts"])
+async def get_all_karts(
+    request: Request,
+    response: Response,
+    limit: int = Query(config.PAGE_LIMIT_DEFAULT, ge=1, le=config.PAGE_LIMIT_MAX),
+    after: int | None = None,
+    stream: bool = False,
+    session: AsyncSession = Depends(get_async_read_session)
+):
+    """Получить все карты"""
+    unchanged = await check_not_modified(request, response, session, "karts")
+    if unchanged:
+        return unchanged
+    return await list_endpoint(Karts, response, limit, after, stream, session)
+
+
+@router.get("/karts/{kart_id}", response_model=Karts, tags=["Karts"])
+async def get_kart(kart_id: int, request: Request, response: Response,
+                   session: AsyncSession = Depends(get_async_read_session)):
+    """Получить карт по ID"""
+    # Кэш сверяется с той же версией таблицы, что и ETag; после своей записи клиент читает мимо кэша
+    version = await req.read_table_version(session, "karts")
+    unchanged = not_modified(request, response, version)
+    if unchanged:
+        return unchanged
+    kart = await req.read_kart_by_id(session, kart_id, version.version if version else None,
+                                     cached=not uses_primary(request))
+    if not kart:
+        raise HTTPException(status_code=404, detail="Карт не найден")
+    return kart
+
+
+# ===== TRACKS ENDPOINTS =====
+@router.get("/tracks", response_model=list[Tracks], tags=["Tracks"])
+async def get_all_tracks(
+    request: Request,
+    response: Response,
+    limit: int = Query(config.PAGE_LIMIT_DEFAULT, ge=1, le=config.PAGE_LIMIT_MAX),
+    after: int | None = None,
+    stream: bool = False,
+    session: AsyncSession = Depends(get_async_read_session)
+):
+    """Получить все трассы"""
+    unchanged = await check_not_modified(request, response, session, "tracks")
+    if unchanged:
+        return unchanged
+    return await list_endpoint(Tracks, response, limit, after, stream, session)
+
+
+@router.get("/tracks/{track_id}", response_model=Tracks, tags=["Tracks"])
+async def get_track(track_id: int, request: Request, response: Response,
+                    session: AsyncSession = Depends(get_async_read_session)):
+    """Получить трассу по ID"""
+    # Кэш сверяется с той же версией таблицы, что и ETag; после своей записи клиент читает мимо кэша
+    version = await req.read_table_version(session, "tracks")
+    unchanged = not_modified(request, response, version)
+    if unchanged:
+        return unchanged
+    track = await req.read_track_by_id(session, track_id, version.version if version else None,
+                                       cached=not uses_primary(request))
+    if not track:
+        raise HTTPException(status_code=404, detail="Трасса не найдена")
+    return track
+
+
+# ===== RACES ENDPOINTS =====
+@router.get("/races", response_model=list[Races], tags=["Races"])
+async def get_all_races(
+    request: Request,
+    response: Response,
+    limit: int = Query(config.PAGE_LIMIT_DEFAULT, ge=1, le=config.PAGE_LIMIT_MAX),
+    after: int | None = None,
+    stream: bool = False,
+    session: AsyncSession = Depends(get_async_read_session)
+):
+    """Получить все гонки"""
+    unchanged = await check_not_modified(request, response, session, "races")
+    if unchanged:
+        return unchanged
+    return await list_endpoint(Races, response, limit, after, stream, session)
+
+
+@router.get("/races/{race_id}", response_model=Races, tags=["Races"])
+async def get_race(race_id: int, request: Request, response: Response,
+                   session: AsyncSession = Depends(get_async_read_session)):
+    """Получить гонку по ID"""
+    # Кэш сверяется с той же версией таблицы, что и ETag; после своей записи клиент читает мимо кэша
+    version = await req.read_table_version(session, "races")
+    unchanged = not_modified(request, response, version)
+    if unchanged:
+        return unchanged
+    race = await req.read_race_by_id(session, race_id, version.version if version else None,
+                                     cached=not uses_primary(request))
+    if not race:
+        raise HTTPException(status_code=404, detail="Гонка не найдена")
+    return race
+
+
+@router.get("/tracks/{track_id}/races", response_model=list[Races], tags=["Races"])
+async def get_races_by_track_id(track_id: int, request: Request, response: Response,
+                                session: AsyncSession = Depends(get_async_read_session)):
+    """Получить все гонки на определенной трассе"""
+    unchanged = await check_not_modified(request, response, session, "races")
+    if unchanged:
+        return unchanged
+    return await req.get_races_by_track(session, track_id)
+
+
+# ===== RACERS ENDPOINTS =====
+@router.get("/racers", response_model=list[Racers], tags=["Racers"])
+async def get_all_racers(
+    response: Response,
+    limit: int = Query(config.PAGE_LIMIT_DEFAULT, ge=1, le=config.PAGE_LIMIT_MAX),
+    after: int | None = None,
+    stream: bool = False,
+    session: AsyncSession = Depends(get_async_read_session)
+):
+    """Получить всех гонщиков"""
+    return await list_endpoint(Racers, response, limit, after, stream, session)
+
+
+# ===== RACE RESULTS ENDPOINTS =====
+@router.get("/races/{race_id}/results", response_model=list[Race_Racer_Kart], tags=["Race Results"])
+async def get_race_results(race_id: int, session: AsyncSession = Depends(get_async_read_session)):
+    """Получить все результаты конкретной гонки"""
+    if config.FAST_JSON:
+        return rows_response(await req.get_race_results_rows(session, race_id))
+    return await req.get_race_results(session, race_id)
+
+
+@router.get("/racers/{racer_id}/history", response_model=list[Race_Racer_Kart], tags=["Race Results"])
+async def get_racer_history(racer_id: int, session: AsyncSession = Depends(get_async_read_session)):
+    """Получить историю всех гонок гонщика"""
+    if config.FAST_JSON:
+        return rows_response(await req.get_racer_history_rows(session, racer_id))
+    return await req.get_racer_history(session, racer_id)
+
+
+# ===== WORKERS ENDPOINTS =====
+@router.get("/workers", response_model=list[Workers], tags=["Workers"])
+async def get_all_workers(
+    response: Response,
+    limit: int = Query(config.PAGE_LIMIT_DEFAULT, ge=1, le=config.PAGE_LIMIT_MAX),
+    after: int | None = None,
+    stream: bool = False,
+    session: AsyncSession = Depends(get_async_read_session)
+):
+    """Получить всех работников"""
+    return await list_endpoint(Workers, response, limit, after, stream, session)
+
+
+# ===== ANALYTICS ENDPOINTS =====
+async def compute_racer_stats(session: AsyncSession, racer_ids: list[int]) -> list[dict]:
+    """Статистика гонщиков (см. api.compute_racer_stats): чтение через run_sync, расчет NumPy в пуле потоков"""
+    if not analytics.load():
+        raise HTTPException(status_code=501, detail="Аналитика недоступна: не установлен NumPy")
+    rows = await session.run_sync(sync_req.get_results_columns, racer_ids)
+    results = await run_in_threadpool(analytics.read_results, rows)
+    races = await session.run_sync(sync_req.get_race_columns, analytics.race_ids(results))
+    return await run_in_threadpool(analytics.racer_stats, racer_ids, results, races)
+
+
+async def racers_stats_response(session: AsyncSession, racer_ids: list[int]) -> Response:
+    """Статистика списка гонщиков в порядке запроса, без повторов и несуществующих ID"""
+    racer_ids = list(dict.fromkeys(racer_ids))
+    if len(racer_ids) > config.ANALYTICS_MAX_IDS:
+        raise HTTPException(status_code=422, detail=f"ids: не больше {config.ANALYTICS_MAX_IDS} гонщиков")
+    found = await session.run_sync(sync_req.existing_ids, Racers, racer_ids)
+    stats = await compute_racer_stats(session, [racer_id for racer_id in racer_ids if racer_id in found])
+    return rows_response(stats)
+
+
+@router.get("/racers/{racer_id}/stats", response_model=RacerStats, tags=["Analytics"])
+async def get_racer_stats(racer_id: int, session: AsyncSession = Depends(get_async_read_session)):
+    """Статистика гонщика по трассам и картам"""
+    if not await session.run_sync(sync_req.existing_ids, Racers, [racer_id]):
+        raise HTTPException(status_code=404, detail="Гонщик не найден")
+    return rows_response((await compute_racer_stats(session, [racer_id]))[0])
+
+
+@router.get("/analytics/racers", response_model=list[RacerStats], tags=["Analytics"])
+async def get_racers_stats(
+    ids: str = Query(..., description="ID гонщиков через запятую"),
+    session: AsyncSession = Depends(get_async_read_session)
+):
+    """Статистика нескольких гонщиков за один запрос (?ids=1,2,3)"""
+    try:
+        racer_ids = [int(value) for value in ids.split(",") if value.strip()]
+    except ValueError:
+        raise HTTPException(status_code=422, detail="ids: ожидаются целые числа через запятую")
+    return await racers_stats_response(session, racer_ids)
+
+
+@router.post("/analytics/racers", response_model=list[RacerStats], tags=["Analytics"])
+async def post_racers_stats(racer_ids: list[int] = Body(...),
+                            session: AsyncSession = Depends(get_async_read_session)):
+    """То же, что GET /analytics/racers, но ID передаются JSON списком в теле"""
+    return await racers_stats_response(session, racer_ids)
+
+
+# ===== EXPORT ENDPOINTS =====
+@router.get("/export/results", tags=["Export"])
+async def export_results(
+    request: Request,
+    date_from: date | None = Query(None, alias="from"),
+    date_to: date | None = Query(None, alias="to"),
+    racer_id: int | None = None,
+    format: str = Query("csv", pattern="^(csv|parquet)$")
+):
+    """Выгрузка результатов гонок (CSV или Parquet) потоком, порции кодируются в пуле потоков"""
+    if format == "parquet" and not export.load():
+        raise HTTPException(status_code=501, detail="Формат parquet недоступен: не установлен pyarrow")
+    bind = async_read_bind(request)
+
+    async def generate():
+        encoder = (export.ParquetEncoder(export.results_schema()) if format == "parquet"
+                   else export.CsvEncoder(sync_req.EXPORT_COLUMNS))
+        async with AsyncSession(bind) as session:
+            chunks = req.iter_export_results(session, config.EXPORT_CHUNK_SIZE, date_from, date_to, racer_id)
+            async for chunk in chunks:
+                yield await run_in_threadpool(encoder.encode, chunk)
+        if data := encoder.close():
+            yield data
+
+    return StreamingResponse(
+        generate(),
+        media_type=export.FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="results.{format}"'}
+    )
@@ -0,0 +1,278 @@
+"""
+Нагрузочный тест API: запросы к endpoints внутри процесса через ASGI (без сети)
+
+    python manage.py generate --racers 100000 --results 1000000   # подготовить данные
+    python benchmark.py --requests 200 --concurrency 10 --output bench.json
+    python benchmark.py --plans    # планы запросов без индексов и с индексами
+    python benchmark.py --serialization    # стоимость сериализации строки: ORM + pydantic и FAST_JSON
+
+Режим --plans временно удаляет индексы race_racer_kart и races, запускайте его на тестовой БД.
+
+Для каждого endpoint считаются задержки p50/p95/p99 и пропускная способность.
+Результаты сохраняются в JSON вместе с хешем коммита, чтобы сравнивать прогоны.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import time
+from datetime import datetime, timezone
+
+# Бенчмарк не должен измерять логирование SQL
+os.environ.setdefault("DB_ECHO", "0")
+
+import httpx
+from pydantic import TypeAdapter
+from sqlmodel import Session, func, select
+
+import api
+import fastjson
+import metrics
+import request as req
+from database import engine
+from model import Karts, Racers, Races, Race_Racer_Kart, Tracks
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Перцентиль (линейная интерполяция), values должны быть отсортированы"""
+    if not values:
+        return 0.0
+    position = (len(values) - 1) * q
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def id_range(session: Session, model) -> tuple[int, int]:
+    low, high = session.exec(select(func.min(model.id), func.max(model.id))).one()
+    return low or 1, high or 1
+
+
+def scenarios(rng: random.Random) -> dict:
+    """Endpoints для прогона: имя -> функция, возвращающая путь запроса"""
+    with Session(engine) as session:
+        karts = id_range(session, Karts)
+        tracks = id_range(session, Tracks)
+        races = id_range(session, Races)
+        racers = id_range(session, Racers)
+
+    return {
+        "GET /karts": lambda: "/karts",
+        "GET /karts/{id}": lambda: f"/karts/{rng.randint(*karts)}",
+        "GET /tracks/{id}": lambda: f"/tracks/{rng.randint(*tracks)}",
+        "GET /races": lambda: "/races",
+        "GET /races/{id}": lambda: f"/races/{rng.randint(*races)}",
+        "GET /races/{id}/full": lambda: f"/races/{rng.randint(*races)}/full",
+        "GET /races/{id}/results": lambda: f"/races/{rng.randint(*races)}/results",
+        "GET /tracks/{id}/races": lambda: f"/tracks/{rng.randint(*tracks)}/races",
+        "GET /tracks/{id}/leaderboard": lambda: f"/tracks/{rng.randint(*tracks)}/leaderboard",
+        "GET /racers": lambda: "/racers",
+        "GET /racers/{id}/history": lambda: f"/racers/{rng.randint(*racers)}/history",
+        "GET /racers/{id}/bests": lambda: f"/racers/{rng.randint(*racers)}/bests",
+        "GET /workers": lambda: "/workers",
+    }
+
+
+async def run_scenario(client: httpx.AsyncClient, make_path, requests: int, concurrency: int) -> dict:
+    """Выполнить requests запросов в concurrency параллельных потоках"""
+    latencies = []
+    errors = 0
+    remaining = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            path = make_path()
+            started = time.perf_counter()
+            response = await client.get(path)
+            latencies.append((time.perf_counter() - started) * 1000)
+            if response.status_code >= 500:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 0.50), 3),
+        "p95_ms": round(percentile(latencies, 0.95), 3),
+        "p99_ms": round(percentile(latencies, 0.99), 3),
+        "mean_ms": round(statistics.fmean(latencies), 3),
+        "rps": round(requests / elapsed, 1),
+    }
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args) -> dict:
+    rng = random.Random(args.seed)
+    selected = scenarios(rng)
+    if args.only:
+        selected = {name: path for name, path in selected.items() if any(part in name for part in args.only)}
+
+    results = {}
+    transport = httpx.ASGITransport(app=api.app)
+    async with api.app.router.lifespan_context(api.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            for name, make_path in selected.items():
+                await run_scenario(client, make_path, args.warmup, 1)  # прогрев
+                results[name] = await run_scenario(client, make_path, args.requests, args.concurrency)
+                stats = results[name]
+                print(f"{name:32} p50={stats['p50_ms']:8.2f}ms p95={stats['p95_ms']:8.2f}ms "
+                      f"p99={stats['p99_ms']:8.2f}ms {stats['rps']:8.1f} req/s errors={stats['errors']}")
+
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "database": engine.url.render_as_string(hide_password=True),
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "results": results,
+    }
+
+
+# ========== QUERY PLANS ==========
+
+def plan_queries(session: Session, rng: random.Random) -> dict:
+    """Запросы, для которых нужны индексы (как в request.py)"""
+    races = id_range(session, Races)
+    racers = id_range(session, Racers)
+    tracks = id_range(session, Tracks)
+    return {
+        "get_race_results": select(Race_Racer_Kart).where(Race_Racer_Kart.race_id == rng.randint(*races)),
+        "get_racer_history": select(Race_Racer_Kart).where(Race_Racer_Kart.racer_id == rng.randint(*racers)),
+        "get_races_by_track": select(Races).where(Races.track_id == rng.randint(*tracks)),
+    }
+
+
+def measure_plans(queries: dict, repeat: int) -> dict:
+    """План выполнения и среднее время каждого запроса"""
+    report = {}
+    with engine.connect() as connection:
+        for name, statement in queries.items():
+            sql = str(statement.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True}))
+            plan = metrics.explain(connection, sql, ())
+            started = time.perf_counter()
+            for _ in range(repeat):
+                connection.exec_driver_sql(sql).fetchall()
+            report[name] = {
+                "plan": plan,
+                "mean_ms": round((time.perf_counter() - started) * 1000 / repeat, 3),
+            }
+    return report
+
+
+def run_plans(args) -> dict:
+    """Сравнить планы и время запросов без индексов и с индексами"""
+    indexes = [*Races.__table__.indexes, *Race_Racer_Kart.__table__.indexes]
+    with Session(engine) as session:
+        queries = plan_queries(session, random.Random(args.seed))
+
+    with engine.begin() as connection:
+        for index in indexes:
+            index.drop(connection, checkfirst=True)
+    before = measure_plans(queries, args.requests)
+    with engine.begin() as connection:
+        for index in indexes:
+            index.create(connection, checkfirst=True)
+    after = measure_plans(queries, args.requests)
+
+    for name in queries:
+        print(f"{name}: {before[name]['mean_ms']:.3f}ms -> {after[name]['mean_ms']:.3f}ms")
+        print(f"    без индексов: {before[name]['plan']}")
+        print(f"    с индексами:  {after[name]['plan']}")
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "database": engine.url.render_as_string(hide_password=True),
+        "plans": {"before": before, "after": after},
+    }
+
+
+# ========== SERIALIZATION ==========
+
+def run_serialization(args) -> dict:
+    """
+    Стоимость одной строки списка: обычный путь (ORM объекты, валидация и dump_json
+    через pydantic, как делает FastAPI с response_model) и быстрый путь FAST_JSON
+    """
+    report = {}
+    for model in (Races, Race_Racer_Kart):
+        adapter = TypeAdapter(list[model])
+        limit = args.rows
+
+        def default_path():
+            with Session(engine) as session:
+                rows = req.read_page(session, model, limit)[0]
+                return adapter.dump_json(adapter.validate_python(rows))
+
+        def fast_path():
+            with Session(engine) as session:
+                return fastjson.dumps(req.read_page_rows(session, model, limit)[0])
+
+        if json.loads(default_path()) != json.loads(fast_path()):
+            raise SystemExit(f"{model.__tablename__}: ответы не совпадают")
+
+        timings = {}
+        for name, path in (("default", default_path), ("fast", fast_path)):
+            started = time.perf_counter()
+            for _ in range(args.requests):
+                body = path()
+            elapsed = time.perf_counter() - started
+            rows = len(json.loads(body))
+            timings[name] = {
+                "rows": rows,
+                "per_request_ms": round(elapsed * 1000 / args.requests, 3),
+                "per_row_us": round(elapsed * 1_000_000 / args.requests / max(rows, 1), 3),
+            }
+        report[model.__tablename__] = timings
+        print(f"{model.__tablename__}: {timings['default']['per_row_us']:.2f} мкс/строка -> "
+              f"{timings['fast']['per_row_us']:.2f} мкс/строка ({timings['fast']['rows']} строк)")
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "database": engine.url.render_as_string(hide_password=True),
+        "orjson": fastjson.orjson is not None,
+        "serialization": report,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест Kart Club API")
+    parser.add_argument("--requests", type=int, default=200, help="запросов на endpoint")
+    parser.add_argument("--concurrency", type=int, default=10, help="параллельных клиентов")
+    parser.add_argument("--warmup", type=int, default=10, help="запросов на прогрев")
+    parser.add_argument("--only", nargs="*", help="прогнать только endpoints, содержащие подстроку")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="сохранить результаты в JSON")
+    parser.add_argument("--plans", action="store_true", help="сравнить планы запросов без индексов и с индексами")
+    parser.add_argument("--serialization", action="store_true", help="сравнить стоимость сериализации строки")
+    parser.add_argument("--rows", type=int, default=1000, help="строк в ответе для --serialization")
+    args = parser.parse_args()
+
+    if args.plans:
+        report = run_plans(args)
+    elif args.serialization:
+        report = run_serialization(args)
+    else:
+        report = asyncio.run(run(args))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"==> Результаты сохранены в {args.output}")
+
+
+if __name__ == "__main__":
+    main()
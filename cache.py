@@ -0,0 +1,91 @@
+"""
+Кэш сущностей по ID (LRU + TTL) для частых обращений к картам, трассам и гонкам
+
+В кэше хранятся отсоединенные от сессии копии строк, возвращаемые объекты нельзя
+изменять или добавлять в сессию. Кэш свой у каждого процесса, поэтому время жизни
+записи (TTL) ограничивает, насколько устаревшими могут быть данные в других воркерах.
+
+Запись можно пометить версией таблицы (table_versions), с которой она прочитана.
+Чтение с версией считает запись другой версии промахом: так endpoints с ETag не отдают
+под новым ETag строку, закэшированную до записи в другом воркере.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from sqlmodel import SQLModel
+
+import config
+
+
+class EntityCache:
+    """Ограниченный по размеру и времени жизни кэш строк таблиц по (таблица, ID)"""
+
+    def __init__(self, max_size: int, ttl: float, enabled: bool = True):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.enabled = enabled
+        # (таблица, ID) -> (копия строки, срок жизни, версия таблицы или None)
+        self._entries: OrderedDict[tuple[str, int], tuple[SQLModel, float, int | None]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, model: type[SQLModel], entity_id: int, version: int | None = None) -> SQLModel | None:
+        """
+        Получить запись из кэша (None - промах)
+        version - текущая версия таблицы: запись, прочитанная при другой версии, - промах
+        """
+        if not self.enabled:
+            return None
+        key = (model.__tablename__, entity_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > time.monotonic() and (version is None or entry[2] == version):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._entries[key]  # Истек TTL или устарела версия
+            self.misses += 1
+            return None
+
+    def put(self, entity: SQLModel | None, version: int | None = None):
+        """Положить (или обновить) запись в кэше; version - версия таблицы, при которой она прочитана"""
+        if not self.enabled or entity is None:
+            return
+        key = (entity.__tablename__, entity.id)
+        copy = type(entity)(**entity.model_dump())
+        with self._lock:
+            self._entries[key] = (copy, time.monotonic() + self.ttl, version)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, model: type[SQLModel], entity_id: int):
+        """Удалить запись из кэша"""
+        with self._lock:
+            self._entries.pop((model.__tablename__, entity_id), None)
+
+    def clear(self):
+        """Очистить кэш"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """Счетчики кэша"""
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+entity_cache = EntityCache(config.CACHE_MAX_SIZE, config.CACHE_TTL, config.CACHE_ENABLED)
@@ -0,0 +1,188 @@
+import inspect
+import threading
+
+from fastapi import Request
+from sqlalchemy import Engine, event
+from sqlmodel import Session, create_engine
+
+import config
+import metrics
+
+
+# ========== DATABASE CONFIGURATION ==========
+
+# Cookie, с которой клиент после записи читает из основной БД
+STICKY_COOKIE = "db_primary"
+
+
+def is_sqlite(url: str) -> bool:
+    """Проверить, что URL указывает на SQLite"""
+    return url.startswith("sqlite")
+
+
+def async_url(url: str) -> str:
+    """Подставить в URL асинхронный драйвер: asyncpg для PostgreSQL, aiosqlite для SQLite"""
+    scheme, rest = url.split("://", 1)
+    if scheme.startswith("postgresql"):
+        return f"postgresql+asyncpg://{rest}"
+    if is_sqlite(scheme):
+        return f"sqlite+aiosqlite://{rest}"
+    return url
+
+
+def pool_options() -> dict:
+    """Настройки пула соединений из config"""
+    return {
+        "pool_size": config.DB_POOL_SIZE,
+        "max_overflow": config.DB_MAX_OVERFLOW,
+        "pool_timeout": config.DB_POOL_TIMEOUT,
+        "pool_recycle": config.DB_POOL_RECYCLE,
+        "pool_pre_ping": config.DB_POOL_PRE_PING,
+    }
+
+
+def set_sqlite_pragmas(engine: Engine):
+    """
+    PRAGMA для каждого нового соединения SQLite:
+    WAL - читатели не блокируются писателем, synchronous=NORMAL - без fsync на каждый commit
+    (в режиме WAL это безопасно для целостности), mmap - чтение файла без копирования
+    """
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        if config.SQLITE_WAL:
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+        if config.SQLITE_MMAP_SIZE:
+            cursor.execute(f"PRAGMA mmap_size={config.SQLITE_MMAP_SIZE}")
+        cursor.close()
+
+
+def make_engine(url: str) -> Engine:
+    """Создать engine с настроенным пулом и метриками"""
+    sqlite = is_sqlite(url)
+    engine = create_engine(
+        url,
+        echo=config.DB_ECHO,
+        poolclass=metrics.TimedQueuePool,  # Измеряет ожидание соединения из пула
+        # Только для SQLite: сессии используются из разных потоков
+        connect_args={"check_same_thread": False} if sqlite else {},
+        **pool_options(),
+    )
+    if sqlite:
+        set_sqlite_pragmas(engine)
+    metrics.instrument_engine(engine)
+    return engine
+
+
+def make_async_engine(url: str):
+    """Создать асинхронный engine с теми же настройками пула"""
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    engine = create_async_engine(async_url(url), echo=config.DB_ECHO, **pool_options())
+    if is_sqlite(url):
+        set_sqlite_pragmas(engine.sync_engine)
+    metrics.instrument_engine(engine.sync_engine)
+    return engine
+
+
+# ========== ENGINES ==========
+
+# Engines создаются при первом обращении (database.engine, from database import engine):
+# импорт модуля не подключает драйвер БД, команды и воркеры, которым БД не нужна, стартуют быстрее
+ENGINE_FACTORIES = {
+    # Пул соединений к основной БД (запись и чтение)
+    "engine": lambda: make_engine(config.DATABASE_URL),
+    # Реплика для чтения; без READ_DATABASE_URL чтение идет в основную БД
+    "read_engine": lambda: (
+        make_engine(config.READ_DATABASE_URL) if config.READ_DATABASE_URL else lazy_engine("engine")
+    ),
+    # Асинхронные engines есть только в async-режиме
+    # (sqlalchemy.ext.asyncio требует greenlet, а драйвер импортируется при создании engine)
+    "async_engine": lambda: make_async_engine(config.DATABASE_URL) if config.DB_MODE == "async" else None,
+    "async_read_engine": lambda: (
+        make_async_engine(config.READ_DATABASE_URL) if config.DB_MODE == "async" and config.READ_DATABASE_URL
+        else lazy_engine("async_engine")
+    ),
+}
+
+_engines_lock = threading.RLock()
+
+
+def lazy_engine(name: str):
+    """Engine по имени из ENGINE_FACTORIES, создается один раз"""
+    if name not in globals():
+        with _engines_lock:
+            if name not in globals():
+                globals()[name] = ENGINE_FACTORIES[name]()  # Дальше обращения идут напрямую, без __getattr__
+    return globals()[name]
+
+
+def __getattr__(name: str):
+    if name in ENGINE_FACTORIES:
+        return lazy_engine(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+async def dispose_engines():
+    """Закрыть пулы созданных engines (при остановке приложения)"""
+    created = {id(bind): bind for name in ENGINE_FACTORIES if (bind := globals().get(name)) is not None}
+    for bind in created.values():
+        result = bind.dispose()
+        if inspect.isawaitable(result):  # AsyncEngine.dispose - корутина
+            await result
+
+
+def uses_primary(request: Request) -> bool:
+    """Клиент недавно писал - читаем из основной БД, чтобы он увидел свои изменения"""
+    return STICKY_COOKIE in request.cookies
+
+
+def read_bind(request: Request) -> Engine:
+    """Engine для чтения в запросе: реплика или основная БД (см. uses_primary)"""
+    return lazy_engine("engine" if uses_primary(request) else "read_engine")
+
+
+def async_read_bind(request: Request):
+    """Асинхронный engine для чтения в запросе (см. read_bind)"""
+    return lazy_engine("async_engine" if uses_primary(request) else "async_read_engine")
+
+
+# ========== DEPENDENCY INJECTION ==========
+
+def get_session():
+    """
+    Dependency для получения сессии БД
+    Используется в endpoints через Depends()
+    """
+    with Session(lazy_engine("engine")) as session:
+        yield session
+
+
+def get_read_session(request: Request):
+    """
+    Dependency для сессии только на чтение (GET endpoints): реплика, если она задана
+    и клиент не писал последние READ_STICKY_SECONDS секунд, иначе основная БД
+    """
+    with Session(read_bind(request)) as session:
+        yield session
+
+
+async def get_async_session():
+    """
+    Dependency для получения асинхронной сессии БД (режим DB_MODE=async)
+    """
+    from sqlmodel.ext.asyncio.session import AsyncSession
+
+    async with AsyncSession(lazy_engine("async_engine"), expire_on_commit=False) as session:
+        yield session
+
+
+async def get_async_read_session(request: Request):
+    """
+    Асинхронная сессия только на чтение (см. get_read_session)
+    """
+    from sqlmodel.ext.asyncio.session import AsyncSession
+
+    async with AsyncSession(async_read_bind(request), expire_on_commit=False) as session:
+        yield session
@@ -0,0 +1,44 @@
+"""
+Условные GET по версиям таблиц: ETag / Last-Modified и ответ 304 Not Modified
+
+Версия таблицы хранится в БД (table_versions) и меняется в одной транзакции с данными,
+поэтому все воркеры выдают одинаковый ETag. Проверка версии - один запрос по первичному
+ключу вместо выборки и сериализации всего списка.
+"""
+from datetime import timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+from fastapi import Request, Response
+
+from model import Table_Versions
+
+
+def not_modified(request: Request, response: Response, version: Table_Versions | None) -> Response | None:
+    """
+    Проставить ETag и Last-Modified в ответ и вернуть 304, если у клиента актуальная версия
+    """
+    if version is None:
+        return None
+    etag = f'"{version.name}-{version.version}"'
+    updated_at = version.updated_at
+    if updated_at.tzinfo is None:  # SQLite хранит время без часового пояса
+        updated_at = updated_at.replace(tzinfo=timezone.utc)
+    headers = {"ETag": etag, "Last-Modified": format_datetime(updated_at, usegmt=True)}
+    response.headers.update(headers)
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        if etag in tags or "*" in tags:
+            return Response(status_code=304, headers=headers)
+        return None
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return None
+        if updated_at.replace(microsecond=0) <= since:
+            return Response(status_code=304, headers=headers)
+    return None
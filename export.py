@@ -0,0 +1,130 @@
+"""
+Потоковая выгрузка строк в CSV и Parquet
+
+Строки приходят порциями (см. request.iter_export_results), каждая порция сразу кодируется
+и отдается клиенту. В памяти держится только текущая порция, первые байты уходят сразу.
+Parquet пишется по одной row group на порцию, сам файл не собирается целиком.
+Кодировщики (CsvEncoder, ParquetEncoder) хранят состояние между порциями, поэтому
+асинхронная выгрузка (DB_MODE=async) кодирует те же порции по одной.
+"""
+import csv
+import io
+from typing import Iterable, Iterator, Sequence
+
+# pyarrow импортируется при первой выгрузке в parquet (load), а не при запуске приложения
+pa = pq = None
+
+FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def load() -> bool:
+    """Импортировать pyarrow; False - не установлен (формат parquet недоступен)"""
+    global pa, pq
+    if pq is None:
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            return False
+        pa, pq = pyarrow, pyarrow.parquet
+    return True
+
+
+class CsvEncoder:
+    """CSV с заголовком; дата и время в ISO формате"""
+
+    def __init__(self, columns: Sequence[str]):
+        self.buffer = io.StringIO()
+        self.writer = csv.writer(self.buffer)
+        self.writer.writerow(columns)
+
+    def encode(self, chunk: Sequence[tuple]) -> bytes:
+        self.writer.writerows(chunk)
+        return self.close()
+
+    def close(self) -> bytes:
+        """Еще не отданные байты (заголовок, если порций не было)"""
+        data = self.buffer.getvalue().encode("utf-8")
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        return data
+
+
+class ChunkSink(io.RawIOBase):
+    """
+    Файл только на запись, из которого можно забирать уже записанные байты
+    ParquetWriter пишет смещения по tell(), поэтому позиция считается от начала файла
+    """
+    def __init__(self):
+        self.parts: list[bytes] = []
+        self.position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.parts.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def drain(self) -> bytes:
+        data = b"".join(self.parts)
+        self.parts.clear()
+        return data
+
+
+class ParquetEncoder:
+    """Parquet: одна row group на порцию строк"""
+
+    def __init__(self, schema: "pa.Schema"):
+        self.schema = schema
+        self.sink = ChunkSink()
+        self.writer = pq.ParquetWriter(self.sink, schema)
+
+    def encode(self, chunk: Sequence[tuple]) -> bytes:
+        arrays = [pa.array(column, type=field.type) for column, field in zip(zip(*chunk), self.schema)]
+        self.writer.write_table(pa.Table.from_arrays(arrays, schema=self.schema))
+        return self.sink.drain()
+
+    def close(self) -> bytes:
+        """Footer файла"""
+        self.writer.close()
+        return self.sink.drain()
+
+
+def encode_chunks(encoder: CsvEncoder | ParquetEncoder, chunks: Iterable[Sequence[tuple]]) -> Iterator[bytes]:
+    """Закодировать порции строк по мере чтения"""
+    for chunk in chunks:
+        yield encoder.encode(chunk)
+    if data := encoder.close():
+        yield data
+
+
+def csv_chunks(columns: Sequence[str], chunks: Iterable[Sequence[tuple]]) -> Iterator[bytes]:
+    return encode_chunks(CsvEncoder(columns), chunks)
+
+
+def parquet_chunks(schema: "pa.Schema", chunks: Iterable[Sequence[tuple]]) -> Iterator[bytes]:
+    return encode_chunks(ParquetEncoder(schema), chunks)
+
+
+def results_schema() -> "pa.Schema":
+    """Схема Parquet для request.EXPORT_COLUMNS"""
+    return pa.schema([
+        ("id", pa.int64()),
+        ("race_id", pa.int64()),
+        ("race_date", pa.date32()),
+        ("track_id", pa.int64()),
+        ("track_name", pa.string()),
+        ("racer_id", pa.int64()),
+        ("racer_name", pa.string()),
+        ("kart_id", pa.int64()),
+        ("kart_model", pa.string()),
+        ("duration", pa.time64("us")),
+    ])
@@ -0,0 +1,42 @@
+"""
+Быстрая сериализация больших списков (режим FAST_JSON)
+
+Строки берутся из БД кортежами (без ORM объектов и identity map) и кодируются в JSON
+без повторной валидации через pydantic. Формат значений совпадает с обычным ответом:
+даты и время в ISO формате, компактный JSON без пробелов, UTF-8 без экранирования.
+Ключи идут в порядке полей модели.
+"""
+import json
+from datetime import date, time
+from typing import Any
+
+from fastapi import Response
+
+try:
+    import orjson
+except ImportError:  # orjson не обязателен, без него используется стандартный json
+    orjson = None
+
+
+def _default(value: Any):
+    if isinstance(value, (date, time)):
+        return value.isoformat()
+    raise TypeError(f"Тип {type(value).__name__} не сериализуется в JSON")
+
+
+def dumps(rows: list[dict] | dict) -> bytes:
+    """Закодировать строки в JSON"""
+    if orjson is not None:
+        return orjson.dumps(rows)
+    return json.dumps(rows, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+
+def rows_response(rows: list[dict] | dict, response: Response | None = None) -> Response:
+    """
+    Готовый JSON ответ; заголовки, уже проставленные в response (ETag, X-Next-Cursor),
+    переносятся в него
+    """
+    headers = {}
+    if response is not None:
+        headers = {key: value for key, value in response.headers.items() if key != "content-length"}
+    return Response(content=dumps(rows), media_type="application/json", headers=headers)
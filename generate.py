@@ -0,0 +1,127 @@
+"""
+Генератор синтетических данных для нагрузочного тестирования
+
+Заполняет БД (SQLite или PostgreSQL) заданными объемами: вставка пачками через
+executemany, одна транзакция на пачку. ID новых строк определяются по диапазону
+после вставки, поэтому генератор можно запускать на уже заполненной БД.
+"""
+import random
+import time as timer
+from datetime import date, time, timedelta
+
+from sqlalchemy import Engine, func, insert
+from sqlmodel import Session, SQLModel, select
+
+from model import Karts, Tracks, Racers, Workers, Races, Race_Racer_Kart, Workers_Race
+import request as req
+
+FIRST_NAMES = ["Иван", "Анна", "Сергей", "Мария", "Алексей", "Ольга", "Дмитрий", "Елена",
+               "Max", "Lewis", "Charles", "Lando", "Kimi", "Oscar", "George", "Nico"]
+LAST_NAMES = ["Петров", "Смирнова", "Иванов", "Кузнецова", "Соколов", "Попова", "Волков",
+              "Verstappen", "Hamilton", "Leclerc", "Norris", "Raikkonen", "Piastri", "Russell"]
+KART_MODELS = ["SuperKart X1", "RacingKart Pro", "TurboKart 5000", "Sodi RT10", "Birel AM29"]
+TIRES = ["Soft", "Medium", "Hard", "Rain"]
+STATUSES = ["marshal", "mechanic", "instructor", "admin"]
+
+
+def random_date(rng: random.Random, start: date, days: int) -> date:
+    return start + timedelta(days=rng.randrange(days))
+
+
+def random_duration(rng: random.Random) -> time:
+    """Время заезда от 55 до 120 секунд с микросекундами"""
+    micros = rng.randrange(55_000_000, 120_000_000)
+    seconds, micros = divmod(micros, 1_000_000)
+    return time(0, seconds // 60, seconds % 60, micros)
+
+
+def bulk_insert(engine: Engine, model: type[SQLModel], count: int, make_row, chunk_size: int,
+                progress: bool = True) -> tuple[int, int]:
+    """
+    Вставить count строк пачками по chunk_size, вернуть диапазон ID новых строк
+    """
+    with Session(engine) as session:
+        first = (session.exec(select(func.max(model.id))).one() or 0) + 1
+    started = timer.perf_counter()
+    done = 0
+    while done < count:
+        size = min(chunk_size, count - done)
+        with Session(engine) as session:
+            session.execute(insert(model), [make_row() for _ in range(size)])
+            session.commit()
+        done += size
+        if progress:
+            rate = done / (timer.perf_counter() - started)
+            print(f"\r    {model.__tablename__}: {done}/{count} ({rate:,.0f} строк/с)", end="", flush=True)
+    if progress and count:
+        print()
+    with Session(engine) as session:
+        last = session.exec(select(func.max(model.id))).one() or 0
+    return first, last
+
+
+def generate(engine: Engine, tracks: int = 10, karts: int = 200, racers: int = 10_000,
+             workers: int = 100, races: int = 1_000, results: int = 100_000,
+             staff_per_race: int = 2, chunk_size: int = 10_000, seed: int = 1) -> dict:
+    """
+    Заполнить БД синтетическими данными, вернуть количество вставленных строк по таблицам
+    """
+    rng = random.Random(seed)
+    SQLModel.metadata.create_all(engine)
+
+    track_ids = bulk_insert(engine, Tracks, tracks, lambda: {
+        "name": f"Track {rng.randrange(1_000_000)}",
+        "state": True,
+        "open": rng.random() < 0.8,
+        "length": round(rng.uniform(0.8, 3.5), 2),
+    }, chunk_size)
+    kart_ids = bulk_insert(engine, Karts, karts, lambda: {
+        "model": rng.choice(KART_MODELS),
+        "state": rng.random() < 0.9,
+        "tires": rng.choice(TIRES),
+        "tires_change_date": random_date(rng, date(2024, 1, 1), 700),
+        "rain": rng.random() < 0.3,
+    }, chunk_size)
+    racer_ids = bulk_insert(engine, Racers, racers, lambda: {
+        "name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {rng.randrange(100_000)}",
+        "club_card": rng.random() < 0.5,
+        "date_of_birth": random_date(rng, date(1970, 1, 1), 15_000),
+        "date_of_registration": random_date(rng, date(2018, 1, 1), 2_900),
+        "best_time": time(0, 2, 0),
+    }, chunk_size)
+    worker_ids = bulk_insert(engine, Workers, workers, lambda: {
+        "name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+        "date_of_birth": random_date(rng, date(1960, 1, 1), 15_000),
+        "status": rng.choice(STATUSES),
+        "salary": round(rng.uniform(30_000, 150_000), 2),
+    }, chunk_size)
+    race_ids = bulk_insert(engine, Races, races, lambda: {
+        "track_id": rng.randint(*track_ids),
+        "race_date": random_date(rng, date(2018, 1, 1), 2_900),
+    }, chunk_size)
+    bulk_insert(engine, Race_Racer_Kart, results, lambda: {
+        "race_id": rng.randint(*race_ids),
+        "racer_id": rng.randint(*racer_ids),
+        "kart_id": rng.randint(*kart_ids),
+        "duration": random_duration(rng),
+    }, chunk_size)
+    if workers:
+        bulk_insert(engine, Workers_Race, races * staff_per_race, lambda: {
+            "worker_id": rng.randint(*worker_ids),
+            "race_id": rng.randint(*race_ids),
+        }, chunk_size)
+
+    # Лидерборды и личные рекорды пересчитываются одним проходом по всей истории
+    with Session(engine) as session:
+        req.rebuild_best_times(session)
+        req.rebuild_kart_usage(session)
+        # Закэшированные клиентами списки устарели
+        req.ensure_table_versions(session)
+        for table in req.VERSIONED_TABLES:
+            req.bump_table_version(session, table)
+        session.commit()
+
+    return {
+        "tracks": tracks, "karts": karts, "racers": racers, "workers": workers,
+        "races": races, "race_racer_kart": results, "workers_race": races * staff_per_race if workers else 0,
+    }
@@ -0,0 +1,146 @@
+"""
+Потоковый импорт гонщиков и результатов из CSV / JSON lines
+
+Файл читается построчно, строки копятся в порции по chunk_size записей. Каждая порция
+проверяется моделью (RacerBase / RaceResultBase) и записывается одной транзакцией,
+результаты - через пакетную запись request.create_race_racer_karts (как /race-results/batch).
+Ошибочные строки не прерывают импорт и попадают в отчет с номером строки файла.
+
+Продолжение после обрыва: report.processed - сколько записей файла уже закоммичено,
+повторный запуск с skip=processed пропускает их.
+"""
+import csv
+import json
+from typing import Callable, Iterator, TextIO
+
+from pydantic import ValidationError
+from sqlalchemy import Engine
+from sqlmodel import Session
+
+from model import ImportReport, ImportRowError, RacerBase, RaceResultBase
+import request as req
+
+KINDS = ("racers", "results")
+FORMATS = ("csv", "jsonl")
+
+# Альтернативные названия колонок в выгрузках системы хронометража
+RACER_NAME_KEYS = ("racer_name", "racer")
+KART_NUMBER_KEYS = ("kart_number", "kart")
+
+
+def validation_detail(error: ValidationError) -> str:
+    """Ошибки pydantic одной строкой: "поле: сообщение; ..." """
+    return "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in error.errors())
+
+
+def read_records(stream: TextIO, fmt: str) -> Iterator[tuple[int, dict | str]]:
+    """
+    Записи файла по одной: (номер строки, словарь полей) или (номер строки, текст ошибки)
+    Пустые ячейки CSV считаются отсутствующими полями
+    """
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, {key: value for key, value in row.items() if key and value not in ("", None)}
+    else:
+        for line, text in enumerate(stream, start=1):
+            if not text.strip():
+                continue
+            try:
+                record = json.loads(text)
+            except ValueError as e:
+                yield line, f"Некорректный JSON: {e}"
+                continue
+            yield line, record if isinstance(record, dict) else "Ожидается JSON объект"
+
+
+def resolve_result(record: dict, racer_ids: dict[str, int | None]) -> dict | str:
+    """Подставить racer_id по имени гонщика и kart_id по номеру карта (номер карта - его ID)"""
+    record = dict(record)
+    if "racer_id" not in record:
+        name = next((record.pop(key) for key in RACER_NAME_KEYS if key in record), None)
+        if name is not None:
+            key = str(name).strip().casefold()
+            if key not in racer_ids:
+                return f"Гонщик '{name}' не найден"
+            if racer_ids[key] is None:
+                return f"Несколько гонщиков с именем '{name}', укажите racer_id"
+            record["racer_id"] = racer_ids[key]
+    if "kart_id" not in record:
+        number = next((record.pop(key) for key in KART_NUMBER_KEYS if key in record), None)
+        if number is not None:
+            record["kart_id"] = number
+    return record
+
+
+class Importer:
+    """Импорт одного файла; отчет накапливается в self.report"""
+
+    def __init__(self, session: Session, kind: str, max_errors: int,
+                 progress: Callable[[ImportReport], None] | None = None):
+        self.session = session
+        self.kind = kind
+        self.max_errors = max_errors
+        self.progress = progress
+        self.report = ImportReport()
+        self.racer_ids = req.racer_ids_by_name(session) if kind == "results" else {}
+
+    def reject(self, line: int, detail: str):
+        self.report.rejected += 1
+        if len(self.report.errors) < self.max_errors:
+            self.report.errors.append(ImportRowError(line=line, detail=detail))
+
+    def flush(self, chunk: list[tuple[int, dict | str]]):
+        """Проверить и записать порцию одной транзакцией"""
+        model = RaceResultBase if self.kind == "results" else RacerBase
+        rows = []
+        lines = []  # Номера строк файла для прошедших проверку записей
+        for line, record in chunk:
+            if isinstance(record, dict) and self.kind == "results":
+                record = resolve_result(record, self.racer_ids)
+            if isinstance(record, str):
+                self.reject(line, record)
+                continue
+            try:
+                rows.append(model.model_validate(record))
+                lines.append(line)
+            except ValidationError as e:
+                self.reject(line, validation_detail(e))
+
+        if self.kind == "results":
+            for line, row in zip(lines, req.create_race_racer_karts(rows, self.session)):
+                if isinstance(row, str):
+                    self.reject(line, row)
+                else:
+                    self.report.inserted += 1
+        else:
+            self.report.inserted += req.create_racers(rows, self.session)
+
+        self.report.processed += len(chunk)
+        if self.progress is not None:
+            self.progress(self.report)
+
+    def run(self, records: Iterator[tuple[int, dict | str]], chunk_size: int, skip: int = 0) -> ImportReport:
+        self.report.processed = skip
+        chunk = []
+        for position, record in enumerate(records):
+            if position < skip:
+                continue
+            chunk.append(record)
+            if len(chunk) >= chunk_size:
+                self.flush(chunk)
+                chunk = []
+        if chunk:
+            self.flush(chunk)
+        return self.report
+
+
+def import_file(engine: Engine, stream: TextIO, kind: str, fmt: str, chunk_size: int, skip: int = 0,
+                max_errors: int = 1000, progress: Callable[[ImportReport], None] | None = None) -> ImportReport:
+    """
+    Импортировать файл гонщиков (kind="racers") или результатов (kind="results")
+    skip - сколько первых записей пропустить (report.processed прерванного импорта)
+    """
+    with Session(engine) as session:
+        importer = Importer(session, kind, max_errors, progress)
+        return importer.run(read_records(stream, fmt), chunk_size, skip)
@@ -0,0 +1,112 @@
+"""
+Живой хронометраж: рассылка новых результатов гонки подписчикам (Server-Sent Events)
+
+Для каждой гонки хранится кольцевой буфер последних событий, поэтому подключившийся
+позже зритель (или переподключившийся с заголовком Last-Event-ID) получает пропущенное
+без обращения к БД. Все структуры живут в event loop приложения, публикация из потоков
+пула (синхронные endpoints) передается в loop через call_soon_threadsafe.
+Буфер гонки без подписчиков и новых событий удаляется через idle_timeout секунд.
+"""
+import asyncio
+import json
+import time
+from collections import deque
+from typing import AsyncIterator
+
+import config
+
+
+class RaceFeed:
+    """События одной гонки: кольцевой буфер и очереди подписчиков"""
+
+    def __init__(self, buffer_size: int):
+        self.events: deque[tuple[int, str]] = deque(maxlen=buffer_size)
+        self.next_id = 1
+        self.subscribers: set[asyncio.Queue] = set()
+        self.last_active = time.monotonic()  # Последнее событие или отключение подписчика
+
+
+class LiveHub:
+    """Рассылка событий по гонкам"""
+
+    def __init__(self, buffer_size: int, queue_size: int, keepalive: float, idle_timeout: float):
+        self.buffer_size = buffer_size
+        self.queue_size = queue_size
+        self.keepalive = keepalive
+        self.idle_timeout = idle_timeout
+        self._feeds: dict[int, RaceFeed] = {}
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def start(self, loop: asyncio.AbstractEventLoop):
+        """Привязать рассылку к event loop приложения (вызывается в lifespan)"""
+        self._loop = loop
+
+    def _feed(self, race_id: int) -> RaceFeed:
+        feed = self._feeds.get(race_id)
+        if feed is None:
+            self._evict_idle()  # Новый буфер - повод убрать давно неактивные
+            feed = self._feeds[race_id] = RaceFeed(self.buffer_size)
+        return feed
+
+    def _evict_idle(self):
+        """Удалить буферы гонок без подписчиков, не получавшие событий дольше idle_timeout"""
+        deadline = time.monotonic() - self.idle_timeout
+        for race_id, feed in list(self._feeds.items()):
+            if not feed.subscribers and feed.last_active < deadline:
+                del self._feeds[race_id]
+
+    def publish(self, race_id: int, data: dict):
+        """Опубликовать событие гонки (можно вызывать из любого потока)"""
+        if self._loop is None:
+            return
+        self._loop.call_soon_threadsafe(self._publish, race_id, json.dumps(data, ensure_ascii=False))
+
+    def _publish(self, race_id: int, data: str):
+        feed = self._feed(race_id)
+        event = (feed.next_id, data)
+        feed.next_id += 1
+        feed.events.append(event)
+        feed.last_active = time.monotonic()
+        for queue in list(feed.subscribers):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # Медленный клиент: отключаем, при переподключении он догонит по буферу
+                feed.subscribers.discard(queue)
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+
+    async def subscribe(self, race_id: int, last_event_id: int | None = None) -> AsyncIterator[str]:
+        """
+        Поток событий гонки в формате SSE
+        Сначала отдаются события из буфера (после last_event_id), затем новые
+        """
+        feed = self._feed(race_id)
+        queue: asyncio.Queue = asyncio.Queue(self.queue_size)
+        backlog = [event for event in feed.events if last_event_id is None or event[0] > last_event_id]
+        feed.subscribers.add(queue)
+        try:
+            for event in backlog:
+                yield format_event(event)
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=self.keepalive)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if event is None:
+                    break
+                yield format_event(event)
+        finally:
+            feed.subscribers.discard(queue)
+            feed.last_active = time.monotonic()
+
+
+def format_event(event: tuple[int, str]) -> str:
+    """Сформировать сообщение SSE"""
+    event_id, data = event
+    return f"id: {event_id}\nevent: result\ndata: {data}\n\n"
+
+
+hub = LiveHub(config.LIVE_BUFFER_SIZE, config.LIVE_QUEUE_SIZE, config.LIVE_KEEPALIVE, config.LIVE_FEED_IDLE)
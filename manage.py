@@ -0,0 +1,156 @@
+"""
+Служебные команды
+
+    python manage.py migrate          # применить миграции схемы БД
+    python manage.py rebuild-bests    # пересчитать лидерборды и личные рекорды по истории
+    python manage.py rebuild-usage    # пересчитать счетчики использования картов по истории
+    python manage.py generate --racers 1000000 --races 100000 --results 20000000
+    python manage.py import results timing.csv  # импорт гонщиков (racers) или результатов (results)
+    python manage.py archive --before 2025-01-01  # перенести старые гонки в архивные таблицы
+"""
+import argparse
+import json
+import os
+from datetime import date, timedelta
+
+from sqlmodel import Session, SQLModel
+
+import config
+import migrations
+import request as req
+from database import engine
+
+
+def migrate(args):
+    """Применить миграции схемы БД"""
+    SQLModel.metadata.create_all(engine)
+    applied = migrations.migrate(engine)
+    if not applied:
+        print(f"==> Схема БД актуальна (версия {migrations.LATEST_VERSION})")
+
+
+def rebuild_bests(args):
+    """Пересчитать таблицу лучших времен"""
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        count = req.rebuild_best_times(session)
+    print(f"==> Лучшие времена пересчитаны: {count} записей")
+
+
+def rebuild_usage(args):
+    """Пересчитать счетчики использования картов"""
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        count = req.rebuild_kart_usage(session)
+    print(f"==> Счетчики использования пересчитаны: {count} картов")
+
+
+def generate(args):
+    """Заполнить БД синтетическими данными"""
+    from generate import generate as run_generate
+
+    counts = run_generate(
+        engine, tracks=args.tracks, karts=args.karts, racers=args.racers, workers=args.workers,
+        races=args.races, results=args.results, staff_per_race=args.staff_per_race,
+        chunk_size=args.chunk_size, seed=args.seed
+    )
+    print("==> Сгенерировано: " + ", ".join(f"{table}={count}" for table, count in counts.items()))
+
+
+def archive(args):
+    """Перенести гонки раньше даты в архивные таблицы"""
+    before = args.before or date.today() - timedelta(days=config.ARCHIVE_AFTER_DAYS)
+    SQLModel.metadata.create_all(engine)
+
+    def progress(done, total):
+        print(f"\r    races: {done}/{total}", end="", flush=True)
+
+    with Session(engine) as session:
+        count = req.archive_races(session, before, args.chunk_size, progress)
+    if count:
+        print()
+    print(f"==> В архив перенесено гонок: {count} (раньше {before})")
+
+
+def import_data(args):
+    """
+    Импортировать гонщиков или результаты из CSV / JSON lines
+    После каждой порции число закоммиченных записей сохраняется в файл контрольной точки,
+    повторный запуск продолжает с нее. После успешного импорта файл удаляется
+    """
+    from importer import import_file
+
+    fmt = args.format or ("csv" if args.file.lower().endswith(".csv") else "jsonl")
+    checkpoint = args.checkpoint or args.file + ".checkpoint"
+    skip = args.skip
+    if skip is None:
+        skip = 0
+        if os.path.exists(checkpoint):
+            with open(checkpoint) as file:
+                skip = int(file.read().strip() or 0)
+            print(f"==> Продолжение импорта с записи {skip} ({checkpoint})")
+
+    def progress(report):
+        with open(checkpoint, "w") as file:
+            file.write(str(report.processed))
+        print(f"    обработано {report.processed:,}, записано {report.inserted:,}, отклонено {report.rejected:,}")
+
+    SQLModel.metadata.create_all(engine)
+    with open(args.file, encoding="utf-8-sig", newline="") as stream:
+        report = import_file(engine, stream, args.kind, fmt, args.chunk_size, skip,
+                             config.IMPORT_MAX_ERRORS, progress)
+    if os.path.exists(checkpoint):
+        os.remove(checkpoint)
+
+    if args.rejects:
+        with open(args.rejects, "w", encoding="utf-8") as file:
+            for error in report.errors:
+                file.write(json.dumps(error.model_dump(), ensure_ascii=False) + "\n")
+    else:
+        for error in report.errors:
+            print(f"    строка {error.line}: {error.detail}")
+    print(f"==> Импорт завершен: записано {report.inserted:,}, отклонено {report.rejected:,}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Служебные команды Kart Club API")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("migrate", help="применить миграции схемы БД").set_defaults(func=migrate)
+    commands.add_parser("rebuild-bests", help="пересчитать лидерборды и личные рекорды").set_defaults(func=rebuild_bests)
+    commands.add_parser("rebuild-usage", help="пересчитать счетчики использования картов").set_defaults(func=rebuild_usage)
+
+    generate_parser = commands.add_parser("generate", help="заполнить БД синтетическими данными")
+    generate_parser.add_argument("--tracks", type=int, default=10)
+    generate_parser.add_argument("--karts", type=int, default=200)
+    generate_parser.add_argument("--racers", type=int, default=10_000)
+    generate_parser.add_argument("--workers", type=int, default=100)
+    generate_parser.add_argument("--races", type=int, default=1_000)
+    generate_parser.add_argument("--results", type=int, default=100_000)
+    generate_parser.add_argument("--staff-per-race", type=int, default=2)
+    generate_parser.add_argument("--chunk-size", type=int, default=10_000)
+    generate_parser.add_argument("--seed", type=int, default=1)
+    generate_parser.set_defaults(func=generate)
+
+    archive_parser = commands.add_parser("archive", help="перенести старые гонки с результатами в архивные таблицы")
+    archive_parser.add_argument("--before", type=date.fromisoformat,
+                                help=f"дата гонки, по умолчанию - {config.ARCHIVE_AFTER_DAYS} дней назад")
+    archive_parser.add_argument("--chunk-size", type=int, default=req.ID_CHUNK_SIZE, help="гонок в одной транзакции")
+    archive_parser.set_defaults(func=archive)
+
+    import_parser = commands.add_parser("import", help="импортировать гонщиков или результаты из CSV / JSON lines")
+    import_parser.add_argument("kind", choices=("racers", "results"))
+    import_parser.add_argument("file")
+    import_parser.add_argument("--format", choices=("csv", "jsonl"), help="по умолчанию - по расширению файла")
+    import_parser.add_argument("--chunk-size", type=int, default=config.IMPORT_CHUNK_SIZE)
+    import_parser.add_argument("--skip", type=int, help="пропустить первые N записей (вместо контрольной точки)")
+    import_parser.add_argument("--checkpoint", help="файл контрольной точки, по умолчанию <file>.checkpoint")
+    import_parser.add_argument("--rejects", help="записать отклоненные строки в файл (JSON lines)")
+    import_parser.set_defaults(func=import_data)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""
+Метрики запросов и SQL в формате Prometheus
+
+- время обработки запроса по endpoint (гистограмма)
+- количество SQL запросов и время в БД на один HTTP запрос
+- время ожидания соединения из пула
+- журнал медленных запросов с планом выполнения (EXPLAIN)
+
+Счетчики SQL для текущего HTTP запроса хранятся в ContextVar: middleware кладет туда
+объект RequestStats, а обработчики событий SQLAlchemy увеличивают его счетчики
+(контекст копируется и в поток пула, где выполняются синхронные endpoints).
+"""
+import bisect
+import logging
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from sqlalchemy import Engine, event
+from sqlalchemy.pool import QueuePool
+
+import config
+
+logger = logging.getLogger("kart_club.slow_query")
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 500)
+
+
+def format_labels(labels: list[str], le=None) -> str:
+    """Метки в формате {name="value",...}"""
+    if le is not None:
+        labels = labels + [f'le="{le}"']
+    return "{" + ",".join(labels) + "}" if labels else ""
+
+
+class Histogram:
+    """Гистограмма Prometheus с метками"""
+
+    def __init__(self, name: str, documentation: str, buckets: tuple, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = buckets
+        self.labelnames = labelnames
+        self._series: dict[tuple, list] = {}  # метки -> [счетчики по корзинам, сумма, количество]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * len(self.buckets), 0.0, 0]
+            if index < len(self.buckets):
+                series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, (counts, total, count) in sorted(self._series.items()):
+                base = [f'{name}="{value}"' for name, value in zip(self.labelnames, labels)]
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    lines.append(f"{self.name}_bucket{format_labels(base, bound)} {cumulative}")
+                lines.append(f"{self.name}_bucket{format_labels(base, '+Inf')} {count}")
+                suffix = format_labels(base)
+                lines.append(f"{self.name}_sum{suffix} {total}")
+                lines.append(f"{self.name}_count{suffix} {count}")
+        return lines
+
+
+class Counter:
+    """Счетчик Prometheus без меток"""
+
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: int = 1):
+        with self._lock:
+            self.value += amount
+
+    def render(self) -> list[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter",
+                f"{self.name} {self.value}"]
+
+
+REQUEST_LATENCY = Histogram("http_request_duration_seconds", "Время обработки HTTP запроса",
+                            LATENCY_BUCKETS, ("method", "route", "status"))
+REQUEST_SQL_STATEMENTS = Histogram("http_request_sql_statements", "Количество SQL запросов на HTTP запрос",
+                                   COUNT_BUCKETS, ("method", "route"))
+REQUEST_SQL_TIME = Histogram("http_request_sql_duration_seconds", "Время выполнения SQL на HTTP запрос",
+                             LATENCY_BUCKETS, ("method", "route"))
+SQL_LATENCY = Histogram("sql_statement_duration_seconds", "Время выполнения одного SQL запроса", LATENCY_BUCKETS)
+POOL_WAIT = Histogram("db_pool_checkout_wait_seconds", "Ожидание соединения из пула", LATENCY_BUCKETS)
+SLOW_QUERIES = Counter("sql_slow_queries_total", "Количество медленных SQL запросов")
+
+REGISTRY = (REQUEST_LATENCY, REQUEST_SQL_STATEMENTS, REQUEST_SQL_TIME, SQL_LATENCY, POOL_WAIT, SLOW_QUERIES)
+
+
+@dataclass
+class RequestStats:
+    """SQL статистика одного HTTP запроса"""
+    statements: int = 0
+    sql_time: float = 0.0
+
+
+current_request: ContextVar[RequestStats | None] = ContextVar("current_request", default=None)
+
+
+def render() -> str:
+    """Все метрики в текстовом формате Prometheus"""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def observe_request(method: str, route: str, status: int, elapsed: float, stats: RequestStats):
+    """Записать метрики завершенного HTTP запроса"""
+    REQUEST_LATENCY.observe(elapsed, method, route, str(status))
+    REQUEST_SQL_STATEMENTS.observe(stats.statements, method, route)
+    REQUEST_SQL_TIME.observe(stats.sql_time, method, route)
+
+
+# ========== SQLALCHEMY ==========
+
+class TimedQueuePool(QueuePool):
+    """QueuePool, который измеряет ожидание свободного соединения"""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            POOL_WAIT.observe(time.perf_counter() - started)
+
+
+def explain(connection, statement: str, parameters) -> str:
+    """План выполнения запроса (отдельным курсором, чтобы не вызывать события повторно)"""
+    prefix = "EXPLAIN QUERY PLAN " if connection.dialect.name == "sqlite" else "EXPLAIN "
+    cursor = connection.connection.dbapi_connection.cursor()
+    try:
+        cursor.execute(prefix + statement, parameters)
+        return "\n".join(" ".join(str(column) for column in row) for row in cursor.fetchall())
+    finally:
+        cursor.close()
+
+
+def instrument_engine(engine: Engine):
+    """Подписаться на события выполнения SQL"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+        context._query_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context._query_started
+        SQL_LATENCY.observe(elapsed)
+        stats = current_request.get()
+        if stats is not None:
+            stats.statements += 1
+            stats.sql_time += elapsed
+
+        if elapsed * 1000 >= config.SLOW_QUERY_MS:
+            SLOW_QUERIES.inc()
+            plan = ""
+            if not executemany and statement.lstrip().upper().startswith("SELECT"):
+                try:
+                    plan = explain(connection, statement, parameters)
+                except Exception as e:  # План - вспомогательная информация, запрос уже выполнен
+                    plan = f"EXPLAIN не удался: {e}"
+            logger.warning("Медленный запрос (%.1f мс): %s\n%s", elapsed * 1000, statement, plan)
@@ -0,0 +1,300 @@
+"""
+Версионные миграции схемы БД
+
+create_all создает только отсутствующие таблицы и не меняет существующие, поэтому
+изменения уже созданных таблиц (индексы, типы колонок) оформляются миграциями.
+Номер последней примененной миграции хранится в таблице schema_version.
+Новые таблицы тоже добавляются миграцией: при актуальной версии приложение
+при запуске не выполняет create_all (см. init_schema).
+
+    python manage.py migrate
+"""
+from contextlib import contextmanager
+from typing import Callable, Iterator
+
+from sqlalchemy import Column, Connection, Engine, Integer, MetaData, Table, inspect, select, text
+from sqlmodel import Session, SQLModel
+
+import config
+from model import (
+    Best_Times, Kart_Usage, Race_Entries, Racers, Races, Race_Racer_Kart, Workers_Race, Table_Versions,
+    Races_Archive, Workers_Race_Archive, Race_Racer_Kart_Archive
+)
+
+metadata = MetaData()
+
+schema_version = Table(
+    "schema_version", metadata,
+    Column("version", Integer, nullable=False),
+)
+
+
+def create_indexes(connection: Connection, *models):
+    """Создать объявленные в модели индексы, которых еще нет в БД"""
+    for model in models:
+        for index in model.__table__.indexes:
+            index.create(connection, checkfirst=True)
+
+
+def create_tables(connection: Connection, *models):
+    """Создать таблицы (вместе с индексами), которых еще нет в БД"""
+    for model in models:
+        model.__table__.create(connection, checkfirst=True)
+
+
+def migration_0001(connection: Connection):
+    """Индексы по внешним ключам и датам в races и race_racer_kart"""
+    create_indexes(connection, Races, Race_Racer_Kart)
+
+
+def time_column_to_microseconds(connection: Connection, table: str, column: str):
+    """
+    Перевести колонку TIME в целое число микросекунд
+    PostgreSQL: смена типа на BIGINT. SQLite: значения хранятся текстом "HH:MM:SS.ffffff"
+    и переписываются целыми числами (у объявленного типа TIME числовая affinity,
+    поэтому таблицу пересоздавать не нужно)
+    """
+    columns = {info["name"]: info["type"] for info in inspect(connection).get_columns(table)}
+    if column not in columns:
+        return
+    dialect = connection.dialect.name
+    if dialect == "postgresql":
+        if isinstance(columns[column], Integer):
+            return  # Таблица создана уже с BIGINT
+        connection.execute(text(
+            f"ALTER TABLE {table} ALTER COLUMN {column} TYPE BIGINT "
+            f"USING (EXTRACT(EPOCH FROM {column}) * 1000000)::bigint"
+        ))
+    elif dialect == "sqlite":
+        connection.execute(text(
+            f"UPDATE {table} SET {column} = "
+            f"CAST(substr({column}, 1, 2) AS INTEGER) * 3600000000 "
+            f"+ CAST(substr({column}, 4, 2) AS INTEGER) * 60000000 "
+            f"+ CAST(ROUND(CAST(substr({column}, 7) AS REAL) * 1000000) AS INTEGER) "
+            f"WHERE typeof({column}) = 'text'"
+        ))
+    else:
+        raise NotImplementedError(f"Миграция длительностей не поддерживает {dialect}")
+
+
+def migration_0002(connection: Connection):
+    """Длительности (duration, best_time) хранятся целым числом микросекунд"""
+    time_column_to_microseconds(connection, "race_racer_kart", "duration")
+    time_column_to_microseconds(connection, "racers", "best_time")
+    time_column_to_microseconds(connection, "best_times", "duration")
+
+
+def migration_0003(connection: Connection):
+    """Поиск гонщиков по имени: FTS5 trigram (SQLite) или pg_trgm (PostgreSQL)"""
+    create_indexes(connection, Racers)
+    dialect = connection.dialect.name
+    if dialect == "sqlite":
+        # Внешнее содержимое (content=racers): в индексе только триграммы, имена берутся из racers
+        connection.execute(text(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS racers_fts "
+            "USING fts5(name, content='racers', content_rowid='id', tokenize='trigram')"
+        ))
+        connection.execute(text(
+            "CREATE TRIGGER IF NOT EXISTS racers_fts_insert AFTER INSERT ON racers BEGIN "
+            "INSERT INTO racers_fts(rowid, name) VALUES (new.id, new.name); END"
+        ))
+        connection.execute(text(
+            "CREATE TRIGGER IF NOT EXISTS racers_fts_delete AFTER DELETE ON racers BEGIN "
+            "INSERT INTO racers_fts(racers_fts, rowid, name) VALUES ('delete', old.id, old.name); END"
+        ))
+        connection.execute(text(
+            "CREATE TRIGGER IF NOT EXISTS racers_fts_update AFTER UPDATE OF name ON racers BEGIN "
+            "INSERT INTO racers_fts(racers_fts, rowid, name) VALUES ('delete', old.id, old.name); "
+            "INSERT INTO racers_fts(rowid, name) VALUES (new.id, new.name); END"
+        ))
+        connection.execute(text("INSERT INTO racers_fts(racers_fts) VALUES ('rebuild')"))
+    elif dialect == "postgresql":
+        # Нужны права на CREATE EXTENSION; lower() по кириллице - при UTF-8 локали БД
+        connection.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        connection.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_racers_name_trgm ON racers USING gin (lower(name) gin_trgm_ops)"
+        ))
+
+
+def migration_0004(connection: Connection):
+    """Архивные таблицы гонок"""
+    create_tables(connection, Races_Archive, Workers_Race_Archive, Race_Racer_Kart_Archive)
+
+
+def migration_0005(connection: Connection):
+    """Счетчики использования картов (kart_usage) по истории результатов"""
+    import request as req  # request импортирует кэш и модели, нужен только этой миграции
+
+    create_tables(connection, Kart_Usage)
+    with Session(bind=connection) as session:
+        req.rebuild_kart_usage(session)
+
+
+def migration_0006(connection: Connection):
+    """Предварительные регистрации на заезды (race_entries)"""
+    create_tables(connection, Race_Entries)
+
+
+def migration_0007(connection: Connection):
+    """Индексы назначений персонала для отчетов по работникам"""
+    create_indexes(connection, Workers_Race, Workers_Race_Archive)
+
+
+def migration_0008(connection: Connection):
+    """Строки версий таблиц для ETag (table_versions), в том числе в БД без начальных данных"""
+    import request as req
+
+    create_tables(connection, Table_Versions)
+    with Session(bind=connection) as session:
+        req.ensure_table_versions(session)
+
+
+def migration_0009(connection: Connection):
+    """Лучшие времена и личные рекорды (best_times) по всей истории результатов"""
+    import request as req
+
+    create_tables(connection, Best_Times)
+    with Session(bind=connection) as session:
+        req.rebuild_best_times(session)
+
+
+def migration_0010(connection: Connection):
+    """Поиск гонщиков (SQLite): триграммы начала и конца слов, как в pg_trgm"""
+    if connection.dialect.name != "sqlite":
+        return
+    # Имя индексируется с пробелами по краям: триграммы " iv" и "an " находят короткие
+    # запросы с опечаткой ("Ivn"), у которых нет ни одной верной внутренней триграммы
+    for trigger in ("racers_fts_insert", "racers_fts_delete", "racers_fts_update"):
+        connection.execute(text(f"DROP TRIGGER IF EXISTS {trigger}"))
+    connection.execute(text("DROP TABLE IF EXISTS racers_fts"))
+    # Внешнее содержимое - представление: в индексе только триграммы, имена берутся из racers
+    connection.execute(text(
+        "CREATE VIEW IF NOT EXISTS racers_fts_content AS SELECT id, ' ' || name || ' ' AS name FROM racers"
+    ))
+    connection.execute(text(
+        "CREATE VIRTUAL TABLE racers_fts "
+        "USING fts5(name, content='racers_fts_content', content_rowid='id', tokenize='trigram')"
+    ))
+    connection.execute(text(
+        "CREATE TRIGGER racers_fts_insert AFTER INSERT ON racers BEGIN "
+        "INSERT INTO racers_fts(rowid, name) VALUES (new.id, ' ' || new.name || ' '); END"
+    ))
+    connection.execute(text(
+        "CREATE TRIGGER racers_fts_delete AFTER DELETE ON racers BEGIN "
+        "INSERT INTO racers_fts(racers_fts, rowid, name) VALUES ('delete', old.id, ' ' || old.name || ' '); END"
+    ))
+    connection.execute(text(
+        "CREATE TRIGGER racers_fts_update AFTER UPDATE OF name ON racers BEGIN "
+        "INSERT INTO racers_fts(racers_fts, rowid, name) VALUES ('delete', old.id, ' ' || old.name || ' '); "
+        "INSERT INTO racers_fts(rowid, name) VALUES (new.id, ' ' || new.name || ' '); END"
+    ))
+    connection.execute(text("INSERT INTO racers_fts(racers_fts) VALUES ('rebuild')"))
+
+
+def migration_0011(connection: Connection):
+    """Покрывающие индексы результатов по гонщику (racer_id, race_id, kart_id, duration) для аналитики"""
+    create_indexes(connection, Race_Racer_Kart, Race_Racer_Kart_Archive)
+    # Новые индексы начинаются с тех же колонок и заменяют индексы (racer_id, race_id)
+    for index in ("ix_race_racer_kart_racer_id_race_id", "ix_race_racer_kart_archive_racer_id_race_id"):
+        connection.execute(text(f"DROP INDEX IF EXISTS {index}"))
+
+
+MIGRATIONS = [
+    (1, migration_0001),
+    (2, migration_0002),
+    (3, migration_0003),
+    (4, migration_0004),
+    (5, migration_0005),
+    (6, migration_0006),
+    (7, migration_0007),
+    (8, migration_0008),
+    (9, migration_0009),
+    (10, migration_0010),
+    (11, migration_0011),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+STARTUP_LOCK_KEY = 7_301_001  # Ключ advisory lock подготовки БД (PostgreSQL)
+
+
+def current_version(connection: Connection) -> int:
+    """Номер последней примененной миграции (0 - миграции не применялись или БД пустая)"""
+    if not inspect(connection).has_table(schema_version.name):
+        return 0
+    return connection.execute(select(schema_version.c.version)).scalar() or 0
+
+
+def apply(connection: Connection, number: int, migration: Callable[[Connection], None]):
+    """Применить миграцию и записать ее номер"""
+    migration(connection)
+    connection.execute(schema_version.delete())
+    connection.execute(schema_version.insert().values(version=number))
+    print(f"==> Применена миграция {number}: {migration.__doc__}")
+
+
+def migrate(engine: Engine) -> list[int]:
+    """Применить недостающие миграции, каждую в своей транзакции"""
+    applied = []
+    with engine.begin() as connection:
+        metadata.create_all(connection)
+        version = current_version(connection)
+    for number, migration in MIGRATIONS:
+        if number <= version:
+            continue
+        with engine.begin() as connection:
+            apply(connection, number, migration)
+        applied.append(number)
+    return applied
+
+
+# ========== STARTUP ==========
+
+@contextmanager
+def startup_lock(engine: Engine) -> Iterator[Connection]:
+    """
+    Транзакция, которую в один момент держит только один процесс (воркер uvicorn)
+    PostgreSQL: pg_advisory_xact_lock, SQLite: BEGIN IMMEDIATE (блокировка записи в файл,
+    ждет до SQLITE_STARTUP_LOCK_TIMEOUT секунд)
+    Блокировка снимается при commit / rollback
+    """
+    with engine.connect() as connection:
+        dialect = connection.dialect.name
+        if dialect == "postgresql":
+            connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": STARTUP_LOCK_KEY})
+        elif dialect == "sqlite":
+            # Ожидание блокировки на время чужих миграций, а не 5 секунд по умолчанию
+            busy_timeout = connection.exec_driver_sql("PRAGMA busy_timeout").scalar()
+            connection.exec_driver_sql(f"PRAGMA busy_timeout = {config.SQLITE_STARTUP_LOCK_TIMEOUT * 1000}")
+            try:
+                connection.exec_driver_sql("BEGIN IMMEDIATE")
+            finally:
+                connection.exec_driver_sql(f"PRAGMA busy_timeout = {busy_timeout}")
+        yield connection
+        connection.commit()
+
+
+def init_schema(engine: Engine, setup: Callable[[Connection], None] | None = None) -> bool:
+    """
+    Подготовить БД при запуске приложения
+    Если версия схемы актуальна - один запрос версии, без DDL и блокировок.
+    Иначе под startup_lock одной транзакцией: create_all, недостающие миграции и setup
+    (начальные данные); остальные воркеры ждут блокировку и видят уже готовую схему.
+    Возвращает True, если схема создавалась или обновлялась
+    """
+    with engine.connect() as connection:
+        if current_version(connection) == LATEST_VERSION:
+            return False
+
+    with startup_lock(engine) as connection:
+        if current_version(connection) == LATEST_VERSION:
+            return False  # Другой воркер успел подготовить БД, пока мы ждали блокировку
+        SQLModel.metadata.create_all(connection)
+        metadata.create_all(connection)
+        version = current_version(connection)
+        for number, migration in MIGRATIONS:
+            if number > version:
+                apply(connection, number, migration)
+        if setup is not None:
+            setup(connection)
+    return True
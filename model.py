@@ -1,13 +1,47 @@
+from sqlalchemy import BigInteger, Index, TypeDecorator, UniqueConstraint
 from sqlmodel import Field, Relationship, SQLModel
 
-from datetime import date, time
+from datetime import date, datetime, time
+
+
+def duration_to_us(value: time) -> int:
+    """Время (HH:MM:SS.ffffff) в целое число микросекунд"""
+    return ((value.hour * 60 + value.minute) * 60 + value.second) * 1_000_000 + value.microsecond
+
+
+def us_to_duration(value: int) -> time:
+    """Целое число микросекунд во время (HH:MM:SS.ffffff)"""
+    seconds, microseconds = divmod(int(value), 1_000_000)
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    return time(hours, minutes, seconds, microseconds)
+
+
+class Duration(TypeDecorator):
+    """
+    Длительность заезда: в БД - целое число микросекунд (сортировка, MIN, AVG и разности
+    считаются как целые числа), в Python и API - datetime.time ("HH:MM:SS")
+    """
+    impl = BigInteger
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None or isinstance(value, int):
+            return value
+        return duration_to_us(value)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return us_to_duration(value)
+
 
 class RacerBase(SQLModel):
     name: str
     club_card: bool
     date_of_birth: date
     date_of_registration: date
-    best_time: time
+    best_time: time = Field(sa_type=Duration)
 
 
 class KartBase(SQLModel):
@@ -41,9 +75,184 @@ class RaceResultBase(SQLModel):
     race_id: int
     racer_id: int
     kart_id: int
+    duration: time = Field(sa_type=Duration)
+
+class KartPublic(KartBase):
+    id: int
+
+
+class TrackPublic(TrackBase):
+    id: int
+
+
+class RacerPublic(RacerBase):
+    id: int
+
+
+class WorkerPublic(WorkerBase):
+    id: int
+
+
+class RaceResultDetail(RaceResultBase):
+    id: int
+    racer: RacerPublic
+    kart: KartPublic
+
+
+class WorkerRaceDetail(SQLModel):
+    id: int
+    worker_id: int
+    worker: WorkerPublic
+
+
+class RaceDetail(RaceBase):
+    id: int
+    track: TrackPublic
+    race_racer_karts: list[RaceResultDetail] = []
+    workers_races: list[WorkerRaceDetail] = []
+
+
+class RaceResultBatchError(SQLModel):
+    index: int
+    detail: str
+
+
+class RaceResultBatchReport(SQLModel):
+    inserted: int
+    errors: list[RaceResultBatchError] = []
+
+
+class ClassificationEntry(SQLModel):
+    """Строка классификации гонки"""
+    race_id: int
+    position: int
+    id: int  # ID результата
+    racer_id: int
+    kart_id: int
     duration: time
+    gap_to_leader: time
+    gap_to_ahead: time | None = None  # У лидера - None
+
+
+class KartMaintenance(SQLModel):
+    """Карт, которому пора менять резину (/karts/maintenance-due)"""
+    kart_id: int
+    model: str
+    state: bool
+    tires: str
+    tires_change_date: date
+    races: int
+    tire_races: int
+    tire_driven_minutes: float  # Время на трассе с последней замены резины
+
+
+class RaceDayPlanRequest(SQLModel):
+    """Запрос на планирование дня гонок"""
+    track_id: int
+    race_date: date | None = None
+    racer_ids: list[int]
+    heat_size: int | None = None  # Гонщиков в заезде, по умолчанию RACE_DAY_HEAT_SIZE
+    wet: bool = False             # Мокрая трасса: сначала дождевые карты
+
+
+class PlannedEntry(SQLModel):
+    """Гонщик в запланированном заезде"""
+    racer_id: int
+    kart_id: int
+    best_time: time | None = None  # Лучшее время гонщика на трассе
+
+
+class PlannedHeat(SQLModel):
+    """Созданный заезд дня гонок"""
+    race_id: int
+    heat: int  # Номер заезда в дне, с 1
+    entries: list[PlannedEntry]
+
+
+class WorkerAssignment(SQLModel):
+    """Назначение работника на гонку"""
+    worker_id: int
+    race_id: int
+
+
+class WorkerAssignmentReport(SQLModel):
+    """Итог пакетного назначения / снятия работников"""
+    changed: int  # Назначено или снято
+    skipped: int  # Уже было назначено / не было назначено, повторы в запросе
+
+
+class WorkerPeriodRaces(SQLModel):
+    """Сколько гонок обслужил работник за период"""
+    worker_id: int
+    name: str
+    period: str  # YYYY, YYYY-MM или YYYY-MM-DD
+    races: int
+
+
+class WorkerDoubleBooking(SQLModel):
+    """Работник назначен на несколько гонок в один день"""
+    worker_id: int
+    name: str
+    race_date: date
+    race_ids: list[int]
+
+
+class WorkerPayroll(SQLModel):
+    """Оценка выплаты работнику за период"""
+    worker_id: int
+    name: str
+    status: str
+    races: int   # Обслуженных гонок
+    months: int  # Месяцев, в которых была хотя бы одна гонка
+    salary: float
+    amount: float  # salary * months (оклад) или salary * races (ставка за гонку)
+
+
+class ImportRowError(SQLModel):
+    line: int  # Номер строки файла
+    detail: str
+
+
+class ImportReport(SQLModel):
+    processed: int = 0  # Записей файла обработано и закоммичено (точка продолжения для skip)
+    inserted: int = 0
+    rejected: int = 0
+    errors: list[ImportRowError] = []  # Первые IMPORT_MAX_ERRORS отклоненных строк
+
+class TrackStats(SQLModel):
+    """Статистика гонщика на трассе"""
+    track_id: int
+    races: int
+    best: time
+    mean: time
+    median: time
+    p10: time
+    p90: time
+    stddev: time
+    consistency: float         # Коэффициент вариации (stddev / mean), меньше - стабильнее
+    trend: float | None = None  # Изменение времени, секунд за день (< 0 - гонщик ускоряется)
+
+
+class KartStats(SQLModel):
+    """Статистика гонщика на карте"""
+    kart_id: int
+    races: int
+    best: time
+    mean: time
+    delta: float  # Отклонение среднего на карте от среднего гонщика по тем же трассам, секунд
+
+
+class RacerStats(SQLModel):
+    racer_id: int
+    races: int
+    tracks: list[TrackStats] = []
+    karts: list[KartStats] = []
 
 class Racers(RacerBase, table=True):
+    __table_args__ = (
+        Index("ix_racers_name", "name"),
+    )
+
     id: int | None = Field(default=None, primary_key=True)
     
     # Relationships
@@ -72,6 +281,11 @@ class Workers(WorkerBase, table=True):
 
 
 class Races(RaceBase, table=True):
+    __table_args__ = (
+        Index("ix_races_track_id_race_date", "track_id", "race_date"),
+        Index("ix_races_race_date", "race_date"),
+    )
+
     id: int | None = Field(default=None, primary_key=True)
     track_id: int = Field(foreign_key="tracks.id")
 
@@ -82,6 +296,11 @@ class Races(RaceBase, table=True):
 
 
 class Workers_Race(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_workers_race_race_id_worker_id", "race_id", "worker_id"),
+        Index("ix_workers_race_worker_id_race_id", "worker_id", "race_id"),
+    )
+
     id: int | None = Field(default=None, primary_key=True)
     worker_id: int = Field(foreign_key="workers.id")
     race_id: int = Field(foreign_key="races.id")
@@ -92,6 +311,13 @@ class Workers_Race(SQLModel, table=True):
 
 
 class Race_Racer_Kart(RaceResultBase, table=True):
+    __table_args__ = (
+        Index("ix_race_racer_kart_race_id_duration", "race_id", "duration"),
+        # Покрывающий: результаты гонщика (история, аналитика) читаются из индекса, без строк таблицы
+        Index("ix_race_racer_kart_racer_id_race_id_kart_id_duration", "racer_id", "race_id", "kart_id", "duration"),
+        Index("ix_race_racer_kart_kart_id", "kart_id"),
+    )
+
     id: int | None = Field(default=None, primary_key=True)
     race_id: int = Field(foreign_key="races.id")
     racer_id: int = Field(foreign_key="racers.id")
@@ -103,3 +329,104 @@ class Race_Racer_Kart(RaceResultBase, table=True):
     kart: Karts = Relationship(back_populates="race_racer_karts")
 
 
+# Архив: старые гонки с результатами и персоналом переносятся сюда (manage.py archive)
+# Колонки и порядок полей совпадают с основными таблицами
+
+class Races_Archive(RaceBase, table=True):
+    __tablename__ = "races_archive"
+    __table_args__ = (
+        Index("ix_races_archive_track_id_race_date", "track_id", "race_date"),
+    )
+
+    id: int | None = Field(default=None, primary_key=True)
+    track_id: int = Field(foreign_key="tracks.id")
+
+
+class Workers_Race_Archive(SQLModel, table=True):
+    __tablename__ = "workers_race_archive"
+    __table_args__ = (
+        Index("ix_workers_race_archive_race_id", "race_id"),
+        Index("ix_workers_race_archive_worker_id_race_id", "worker_id", "race_id"),
+    )
+
+    id: int | None = Field(default=None, primary_key=True)
+    worker_id: int = Field(foreign_key="workers.id")
+    race_id: int = Field(foreign_key="races_archive.id")
+
+
+class Race_Racer_Kart_Archive(RaceResultBase, table=True):
+    __tablename__ = "race_racer_kart_archive"
+    __table_args__ = (
+        Index("ix_race_racer_kart_archive_race_id_duration", "race_id", "duration"),
+        Index(
+            "ix_race_racer_kart_archive_racer_id_race_id_kart_id_duration", "racer_id", "race_id", "kart_id", "duration"
+        ),
+    )
+
+    id: int | None = Field(default=None, primary_key=True)
+    race_id: int = Field(foreign_key="races_archive.id")
+    racer_id: int = Field(foreign_key="racers.id")
+    kart_id: int = Field(foreign_key="karts.id")
+
+
+class Race_Entries(SQLModel, table=True):
+    """
+    Предварительная регистрация на заезд: гонщик и назначенный ему карт (/race-days/plan)
+    Результат заезда записывается отдельно в race_racer_kart
+    """
+    __tablename__ = "race_entries"
+    __table_args__ = (
+        UniqueConstraint("race_id", "racer_id"),
+        UniqueConstraint("race_id", "kart_id"),
+    )
+
+    id: int | None = Field(default=None, primary_key=True)
+    race_id: int = Field(foreign_key="races.id")
+    racer_id: int = Field(foreign_key="racers.id")
+    kart_id: int = Field(foreign_key="karts.id")
+
+
+class Best_Times(SQLModel, table=True):
+    """
+    Лучшее время гонщика на трассе (денормализованная таблица для лидербордов)
+    Обновляется в той же транзакции, что и запись результата
+    """
+    __table_args__ = (
+        UniqueConstraint("racer_id", "track_id"),
+        Index("ix_best_times_track_id_duration", "track_id", "duration"),
+    )
+
+    id: int | None = Field(default=None, primary_key=True)
+    racer_id: int = Field(foreign_key="racers.id")
+    track_id: int = Field(foreign_key="tracks.id")
+    race_id: int
+    kart_id: int
+    duration: time = Field(sa_type=Duration)
+
+
+class Kart_Usage(SQLModel, table=True):
+    """
+    Счетчики использования карта (денормализованная таблица для обслуживания)
+    Увеличиваются в той же транзакции, что и запись результата, счетчики резины
+    обнуляются при смене резины (update_kart)
+    """
+    __tablename__ = "kart_usage"
+    __table_args__ = (
+        Index("ix_kart_usage_tire_driven_us", "tire_driven_us"),
+    )
+
+    kart_id: int = Field(foreign_key="karts.id", primary_key=True)
+    races: int = 0           # Всего заездов на карте
+    tire_races: int = 0      # Заездов с последней замены резины
+    # Время на трассе с последней замены резины, микросекунд (может быть больше суток, поэтому не time)
+    tire_driven_us: int = Field(default=0, sa_type=BigInteger)
+
+
+class Table_Versions(SQLModel, table=True):
+    """
+    Версия содержимого таблицы для условных GET (ETag / Last-Modified)
+    Увеличивается в той же транзакции, что и изменение таблицы
+    """
+    name: str = Field(primary_key=True)
+    version: int = 0
+    updated_at: datetime
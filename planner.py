@@ -0,0 +1,45 @@
+"""
+Планирование дня гонок: разбиение гонщиков на заезды и назначение картов
+
+Заезды уравниваются по силе "змейкой": гонщики сортируются по лучшему времени на трассе
+и раздаются по заездам 1, 2, ..., n, n, ..., 2, 1, 1, 2, ... - в каждом заезде есть и быстрые,
+и медленные, размеры заездов отличаются не больше чем на одного.
+Карты берутся из кучи по (подходит ли под погоду, заездов в этот день, заездов за всю историю):
+в дождь сначала дождевые, в сухую - обычные, среди них - реже всех поставленные сегодня,
+а при равенстве - наименее изношенные. Поставленный в заезд карт возвращается в кучу
+с увеличенным счетчиком дня, поэтому нагрузка распределяется равномерно.
+"""
+import heapq
+from datetime import time
+from typing import Sequence
+
+UNKNOWN = time.max  # Гонщики без времени на трассе идут в конец рейтинга
+
+
+def snake_heats(racer_ids: Sequence[int], best_times: dict[int, time], heat_size: int) -> list[list[int]]:
+    """Разбить гонщиков на заезды не больше heat_size человек, равные по силе"""
+    count = -(-len(racer_ids) // heat_size)  # Округление вверх
+    ranked = sorted(racer_ids, key=lambda racer_id: (best_times.get(racer_id, UNKNOWN), racer_id))
+    heats = [[] for _ in range(count)]
+    for place, racer_id in enumerate(ranked):
+        lap, position = divmod(place, count)
+        heats[position if lap % 2 == 0 else count - 1 - position].append(racer_id)
+    return heats
+
+
+def assign_karts(heats: Sequence[Sequence[int]], karts: Sequence[tuple[int, bool, int]],
+                 wet: bool) -> list[list[int]]:
+    """
+    Карты для каждого гонщика каждого заезда
+    karts - (kart_id, rain, races): доступные карты и сколько заездов на них уже было
+    В заезде карты не повторяются, поэтому нужно не меньше картов, чем гонщиков в заезде
+    """
+    queue = [(rain != wet, 0, races, kart_id) for kart_id, rain, races in karts]
+    heapq.heapify(queue)
+    assigned = []
+    for heat in heats:
+        taken = [heapq.heappop(queue) for _ in heat]
+        assigned.append([kart_id for *_, kart_id in taken])
+        for mismatch, today, races, kart_id in taken:
+            heapq.heappush(queue, (mismatch, today + 1, races, kart_id))
+    return assigned
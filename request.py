@@ -1,8 +1,59 @@
-from sqlmodel import Session, select
-from typing import Sequence
-from datetime import date, time
+import math
+from sqlalchemy import (
+    BigInteger, String, case, cast, delete, exists, func, insert, literal_column, or_, text, tuple_,
+    type_coerce, union_all, update
+)
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import joinedload, raiseload, selectinload
+from sqlmodel import Session, SQLModel, select
+from typing import Callable, Iterable, Iterator, Sequence
+from datetime import date, datetime, time, timezone
+
+from cache import entity_cache
+from model import (
+    Karts, Races, Tracks, Workers, Racers, Race_Racer_Kart, Workers_Race, Best_Times, Table_Versions,
+    Kart_Usage, Race_Entries,
+    Races_Archive, Race_Racer_Kart_Archive, Workers_Race_Archive,
+    RacerBase, RaceResultBase, RaceDetail,
+    ClassificationEntry, KartMaintenance, PlannedEntry, PlannedHeat,
+    WorkerAssignment, WorkerAssignmentReport, WorkerPeriodRaces, WorkerDoubleBooking, WorkerPayroll,
+    Duration, duration_to_us
+)
+
+ID_CHUNK_SIZE = 5000  # Сколько ID проверять одним запросом (лимит параметров SQLite)
+SEARCH_FUZZY_CANDIDATES = 200  # Кандидатов на триграмму в нечетком поиске гонщиков (SQLite), ранжируются в Python
+SEARCH_MIN_SIMILARITY = 0.5    # Минимальная доля совпавших триграмм запроса для нечеткого совпадения
+
+# ========== TABLE VERSIONS (условные GET) ==========
+
+VERSIONED_TABLES = ("karts", "tracks", "races")
+
+
+def ensure_table_versions(session: Session) -> None:
+    """Создать недостающие строки версий таблиц (при запуске приложения)"""
+    existing = set(session.exec(select(Table_Versions.name)).all())
+    for name in VERSIONED_TABLES:
+        if name not in existing:
+            session.add(Table_Versions(name=name, version=1, updated_at=datetime.now(timezone.utc)))
+    session.commit()
+
+
+def bump_table_version(session: Session, name: str) -> None:
+    """
+    Увеличить версию таблицы, вызывается до commit изменения
+    Счетчик в БД общий для всех воркеров, версия меняется атомарно вместе с данными
+    """
+    session.execute(
+        update(Table_Versions)
+        .where(Table_Versions.name == name)
+        .values(version=Table_Versions.version + 1, updated_at=datetime.now(timezone.utc))
+    )
+
+
+def read_table_version(session: Session, name: str) -> Table_Versions | None:
+    """Получить текущую версию таблицы"""
+    return session.get(Table_Versions, name)
 
-from model import Karts, Races, Tracks, Workers, Racers, Race_Racer_Kart, Workers_Race
 
 # ========== KARTS ==========
 
@@ -11,16 +62,23 @@ def read_all_karts(session: Session) -> Sequence[Karts]:
     return session.exec(select(Karts)).all()
 
 
-def read_kart_by_id(session: Session, kart_id: int) -> Karts | None:
-    """Получить карт по ID"""
-    return session.get(Karts, kart_id)
+def read_kart_by_id(session: Session, kart_id: int, version: int | None = None,
+                    cached: bool = True) -> Karts | None:
+    """Получить карт по ID (через кэш)"""
+    kart = entity_cache.get(Karts, kart_id, version) if cached else None
+    if kart is None:
+        kart = session.get(Karts, kart_id)
+        entity_cache.put(kart, version)
+    return kart
 
 
 def create_kart(kart: Karts, session: Session) -> Karts:
     """Создать новый карт"""
     session.add(kart)
+    bump_table_version(session, "karts")
     session.commit()
     session.refresh(kart)  # refresh принимает объект!
+    entity_cache.put(kart)
     return kart
 
 
@@ -30,6 +88,11 @@ def update_kart(session: Session, kart_id: int, state: bool, model: str, tires:
     kart = session.get(Karts, kart_id)
     if not kart:
         return None
+
+    # Смена резины обнуляет ее счетчики
+    if (tires != None and tires != kart.tires) or (
+            tires_change_date != None and tires_change_date != kart.tires_change_date):
+        reset_tire_usage(session, kart_id)
     
     if state != None:
         kart.state = state
@@ -47,8 +110,10 @@ def update_kart(session: Session, kart_id: int, state: bool, model: str, tires:
         kart.rain = rain
     
     session.add(kart)
+    bump_table_version(session, "karts")
     session.commit()
     session.refresh(kart)
+    entity_cache.put(kart)
     return kart
 
 
@@ -58,8 +123,11 @@ def delete_kart(kart_id: int, session: Session) -> bool:
     if not kart:
         return False
     
+    session.execute(delete(Kart_Usage).where(Kart_Usage.kart_id == kart_id))
     session.delete(kart)
+    bump_table_version(session, "karts")
     session.commit()
+    entity_cache.invalidate(Karts, kart_id)
     return True
 
 
@@ -70,16 +138,28 @@ def read_all_tracks(session: Session) -> Sequence[Tracks]:
     return session.exec(select(Tracks)).all()
 
 
-def read_track_by_id(session: Session, track_id: int) -> Tracks | None:
-    """Получить трассу по ID"""
-    return session.get(Tracks, track_id)
+def has_tracks(session: Session) -> bool:
+    """Есть ли хотя бы одна трасса (без чтения таблицы целиком)"""
+    return session.exec(select(Tracks.id).limit(1)).first() is not None
+
+
+def read_track_by_id(session: Session, track_id: int, version: int | None = None,
+                     cached: bool = True) -> Tracks | None:
+    """Получить трассу по ID (через кэш)"""
+    track = entity_cache.get(Tracks, track_id, version) if cached else None
+    if track is None:
+        track = session.get(Tracks, track_id)
+        entity_cache.put(track, version)
+    return track
 
 
 def create_track(track: Tracks, session: Session) -> Tracks:
     """Создать новую трассу"""
     session.add(track)
+    bump_table_version(session, "tracks")
     session.commit()
     session.refresh(track)
+    entity_cache.put(track)
     return track
 
 
@@ -90,23 +170,94 @@ def read_all_races(session: Session) -> Sequence[Races]:
     return session.exec(select(Races)).all()
 
 
-def read_race_by_id(session: Session, race_id: int) -> Races | None:
-    """Получить гонку по ID с relationships"""
-    return session.get(Races, race_id)
+def read_race_by_id(session: Session, race_id: int, version: int | None = None,
+                    cached: bool = True) -> Races | None:
+    """Получить гонку по ID (через кэш, без relationships), в том числе из архива"""
+    race = entity_cache.get(Races, race_id, version) if cached else None
+    if race is None:
+        race = session.get(Races, race_id) or from_archive(Races, session.get(Races_Archive, race_id))
+        entity_cache.put(race, version)
+    return race
+
+
+def read_race_detail(session: Session, race_id: int) -> RaceDetail | None:
+    """
+    Получить гонку с трассой, результатами (гонщик и карт) и персоналом
+    Все связи загружаются заранее: 3 запроса независимо от числа результатов,
+    ленивые загрузки запрещены (raiseload), чтобы N+1 не появился незаметно
+    """
+    statement = (
+        select(Races)
+        .where(Races.id == race_id)
+        .options(
+            joinedload(Races.track),
+            selectinload(Races.race_racer_karts).joinedload(Race_Racer_Kart.racer),
+            selectinload(Races.race_racer_karts).joinedload(Race_Racer_Kart.kart),
+            selectinload(Races.workers_races).joinedload(Workers_Race.worker),
+            raiseload("*"),
+        )
+    )
+    race = session.exec(statement).first()
+    if not race:
+        return read_archived_race_detail(session, race_id)
+    detail = RaceDetail.model_validate(race)
+    detail.race_racer_karts.sort(key=lambda result: (result.duration, result.id))
+    return detail
+
+
+def read_archived_race_detail(session: Session, race_id: int) -> RaceDetail | None:
+    """
+    То же, что read_race_detail, для гонки из архива (у архивных моделей нет связей):
+    гонка с трассой, результаты с гонщиками и картами, персонал - 3 запроса
+    """
+    row = session.exec(
+        select(Races_Archive, Tracks).join(Tracks, Tracks.id == Races_Archive.track_id).where(Races_Archive.id == race_id)
+    ).first()
+    if row is None:
+        return None
+    race, track = row
+    results = session.exec(
+        select(Race_Racer_Kart_Archive, Racers, Karts)
+        .join(Racers, Racers.id == Race_Racer_Kart_Archive.racer_id)
+        .join(Karts, Karts.id == Race_Racer_Kart_Archive.kart_id)
+        .where(Race_Racer_Kart_Archive.race_id == race_id)
+        .order_by(Race_Racer_Kart_Archive.duration, Race_Racer_Kart_Archive.id)
+    )
+    workers = session.exec(
+        select(Workers_Race_Archive, Workers)
+        .join(Workers, Workers.id == Workers_Race_Archive.worker_id)
+        .where(Workers_Race_Archive.race_id == race_id)
+        .order_by(Workers_Race_Archive.id)
+    )
+    return RaceDetail(
+        **race.model_dump(),
+        track=track.model_dump(),
+        race_racer_karts=[
+            {**result.model_dump(), "racer": racer.model_dump(), "kart": kart.model_dump()}
+            for result, racer, kart in results
+        ],
+        workers_races=[
+            {"id": assignment.id, "worker_id": assignment.worker_id, "worker": worker.model_dump()}
+            for assignment, worker in workers
+        ],
+    )
 
 
 def create_race(race: Races, session: Session) -> Races:
     """Создать новую гонку"""
     session.add(race)
+    bump_table_version(session, "races")
     session.commit()
     session.refresh(race)
+    entity_cache.put(race)
     return race
 
 
 def get_races_by_track(session: Session, track_id: int) -> Sequence[Races]:
-    """Получить все гонки на определенной трассе"""
+    """Получить все гонки на определенной трассе (архивные - в начале)"""
+    archived = session.exec(select(Races_Archive).where(Races_Archive.track_id == track_id))
     statement = select(Races).where(Races.track_id == track_id)
-    return session.exec(statement).all()
+    return [from_archive(Races, race) for race in archived] + list(session.exec(statement))
 
 
 # ========== RACERS ==========
@@ -124,6 +275,196 @@ def create_racer(racer: Racers, session: Session) -> Racers:
     return racer
 
 
+def create_racers(racers: Sequence[RacerBase], session: Session) -> int:
+    """Пакетное создание гонщиков одной транзакцией"""
+    if racers:
+        session.execute(insert(Racers), [racer.model_dump() for racer in racers])  # executemany
+        session.commit()
+    return len(racers)
+
+
+def racer_ids_by_name(session: Session) -> dict[str, int | None]:
+    """
+    Справочник имя гонщика -> ID для импорта (имя без учета регистра и крайних пробелов)
+    Для имен, которые носят несколько гонщиков, значение None
+    """
+    lookup: dict[str, int | None] = {}
+    for racer_id, name in session.exec(select(Racers.id, Racers.name)):
+        key = name.strip().casefold()
+        lookup[key] = None if key in lookup else racer_id
+    return lookup
+
+
+# ========== RACER SEARCH ==========
+
+def trigrams(value: str) -> set[str]:
+    """Триграммы слов строки без учета регистра (как в pg_trgm: слово дополняется пробелами)"""
+    result = set()
+    for word in value.casefold().split():
+        padded = f"  {word} "
+        result.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return result
+
+
+def word_similarity(query: str, name: str) -> float:
+    """Доля триграмм запроса, которые есть в имени (аналог word_similarity из pg_trgm)"""
+    query_trigrams = trigrams(query)
+    if not query_trigrams:
+        return 0.0
+    return len(query_trigrams & trigrams(name)) / len(query_trigrams)
+
+
+def fts_phrase(value: str) -> str:
+    """Строка как фраза запроса FTS5"""
+    return '"' + value.replace('"', '""') + '"'
+
+
+def fts_trigrams(query: str) -> list[str]:
+    """
+    Перекрывающиеся триграммы слов запроса для racers_fts (имя там с пробелами по краям):
+    с пробелом в начале и конце слова, как в pg_trgm. При опечатке или перестановке часть
+    триграмм остается верной, их OR дает кандидатов
+    """
+    result = []
+    for word in query.casefold().split():
+        padded = f" {word} "
+        result.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+    return list(dict.fromkeys(result))
+
+
+def like_escape(value: str) -> str:
+    """Экранировать спецсимволы LIKE обратной косой чертой"""
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def case_variants(query: str) -> list[str]:
+    """Варианты регистра запроса для поиска по индексу ix_racers_name (без свертки регистра)"""
+    return list(dict.fromkeys((query, query.capitalize(), query.lower())))
+
+
+def _search_racer_ids_prefix(session: Session, query: str, limit: int) -> list[int]:
+    """Начало имени по индексу ix_racers_name"""
+    ids = []
+    for variant in case_variants(query):
+        statement = (
+            select(Racers.id)
+            .where(Racers.name >= variant, Racers.name < variant + "\U0010ffff")
+            .order_by(Racers.name, Racers.id)
+            .limit(limit)
+        )
+        ids.extend(session.exec(statement).all())
+    return list(dict.fromkeys(ids))[:limit]
+
+
+def _search_racer_ids_short(session: Session, query: str, limit: int) -> list[int]:
+    """
+    Запрос короче триграммы: имена, начинающиеся с запроса (индекс ix_racers_name), затем
+    в SQLite - слова внутри имени, начинающиеся с двух букв запроса (триграмма " xx" в racers_fts)
+    """
+    ids = dict.fromkeys(_search_racer_ids_prefix(session, query, limit))
+    if len(ids) < limit and len(query) == 2 and session.get_bind().dialect.name == "sqlite":
+        statement = text("SELECT rowid FROM racers_fts WHERE racers_fts MATCH :expression LIMIT :count")
+        found = session.execute(statement, {"expression": fts_phrase(" " + query), "count": limit + len(ids)})
+        ids.update(dict.fromkeys(found.scalars()))
+    return list(ids)[:limit]
+
+
+def fuzzy_min_matches(query: str) -> int:
+    """
+    Сколько триграмм racers_fts (fts_trigrams) должно быть в имени, чтобы word_similarity
+    могла достичь SEARCH_MIN_SIMILARITY. Триграмм "  x" (по одной на слово) в индексе нет,
+    поэтому они считаются совпавшими
+    """
+    return max(1, math.ceil(SEARCH_MIN_SIMILARITY * len(trigrams(query))) - len(query.split()))
+
+
+def _search_racer_ids_sqlite(session: Session, query: str, limit: int) -> list[int]:
+    """
+    Поиск по racers_fts (FTS5 trigram): сначала имена, начинающиеся с запроса (ix_racers_name),
+    затем содержащие его, затем нечеткие совпадения. Все запросы к индексам - с LIMIT и без сортировки
+    по релевантности, частота слов и триграмм оценивается с потолком SEARCH_FUZZY_CANDIDATES:
+    время не зависит от того, сколько имен содержит частую триграмму.
+
+    Подстрока: в имени есть каждое слово запроса. Имена самого редкого слова проверяются в Python,
+    если все слова частые - фраза FTS5.
+    Нечеткий шаг: похожее имя содержит не меньше fuzzy_min_matches триграмм запроса, а значит -
+    хотя бы одну из (найденных - нужных + 1) самых редких. Кандидаты берутся только по ним, у частой
+    триграммы - имена, где есть еще одна триграмма запроса, и только пока кандидатов меньше потолка.
+    Кандидаты ранжируются word_similarity, как в pg_trgm
+    """
+    def match(expression: str, count: int) -> list[tuple[int, str]]:
+        statement = text("SELECT rowid, name FROM racers_fts WHERE racers_fts MATCH :expression LIMIT :count")
+        return session.execute(statement, {"expression": expression, "count": count}).all()
+
+    def frequency(expression: str) -> int:
+        statement = text(
+            "SELECT count(*) FROM (SELECT rowid FROM racers_fts WHERE racers_fts MATCH :expression LIMIT :count)"
+        )
+        return session.execute(statement, {"expression": expression, "count": SEARCH_FUZZY_CANDIDATES}).scalar()
+
+    ids = dict.fromkeys(_search_racer_ids_prefix(session, query, limit))
+    if len(ids) < limit:
+        needle = query.casefold()
+        words = sorted((frequency(fts_phrase(word)), word) for word in set(needle.split()) if len(word) >= 3)
+        if words and words[0][0] < SEARCH_FUZZY_CANDIDATES:
+            rows = match(fts_phrase(words[0][1]), SEARCH_FUZZY_CANDIDATES)
+            ids.update(dict.fromkeys(racer_id for racer_id, name in rows if needle in name.casefold()))
+        elif not words:
+            ids.update(dict.fromkeys(racer_id for racer_id, _ in match(fts_phrase(query), limit + len(ids))))
+    if len(ids) < limit:
+        counts = {trigram: frequency(fts_phrase(trigram)) for trigram in fts_trigrams(query)}
+        present = sorted((trigram for trigram, count in counts.items() if count), key=counts.get)
+        need = fuzzy_min_matches(query)
+        candidates: dict[int, str] = {}
+        for trigram in present[:max(0, len(present) - need + 1)]:
+            expression = fts_phrase(trigram)
+            if counts[trigram] >= SEARCH_FUZZY_CANDIDATES:
+                if len(candidates) >= SEARCH_FUZZY_CANDIDATES:
+                    break  # Дальше только частые триграммы, кандидатов уже достаточно
+                if need > 1:
+                    others = " OR ".join(fts_phrase(other) for other in present if other != trigram)
+                    expression = f"{expression} AND ({others})"
+            candidates.update(match(expression, SEARCH_FUZZY_CANDIDATES))
+        scored = [(word_similarity(query, name), racer_id) for racer_id, name in candidates.items() if racer_id not in ids]
+        scored = sorted((item for item in scored if item[0] >= SEARCH_MIN_SIMILARITY), key=lambda item: (-item[0], item[1]))
+        ids.update(dict.fromkeys(racer_id for _, racer_id in scored))
+    return list(ids)[:limit]
+
+
+def _search_racer_ids_postgresql(session: Session, query: str, limit: int) -> list[int]:
+    """
+    Поиск по GIN индексу pg_trgm на lower(name): подстрока (LIKE) или похожее слово (<%),
+    сначала имена, начинающиеся с запроса, затем по убыванию word_similarity
+    """
+    pattern = like_escape(query.lower())
+    statement = text(
+        "SELECT id FROM racers "
+        "WHERE lower(name) LIKE '%' || :pattern || '%' OR :query <% lower(name) "
+        "ORDER BY lower(name) LIKE :pattern || '%' DESC, word_similarity(:query, lower(name)) DESC, id "
+        "LIMIT :limit"
+    )
+    return list(session.execute(statement, {"pattern": pattern, "query": query.lower(), "limit": limit}).scalars())
+
+
+def search_racers(session: Session, query: str, limit: int) -> list[Racers]:
+    """
+    Поиск гонщиков по имени: по префиксу, без учета регистра, с одной опечаткой
+    Результат упорядочен по релевантности
+    """
+    query = " ".join(query.split())
+    dialect = session.get_bind().dialect.name
+    if len(query) < 3:
+        ids = _search_racer_ids_short(session, query, limit)
+    elif dialect == "sqlite":
+        ids = _search_racer_ids_sqlite(session, query, limit)
+    elif dialect == "postgresql":
+        ids = _search_racer_ids_postgresql(session, query, limit)
+    else:
+        raise NotImplementedError(f"Поиск гонщиков не поддерживает {dialect}")
+    racers = {racer.id: racer for racer in session.exec(select(Racers).where(Racers.id.in_(ids)))}
+    return [racers[racer_id] for racer_id in ids if racer_id in racers]
+
+
 # ========== RACE_RACER_KART (связующая таблица) ==========
 
 def create_race_racer_kart(race_racer_kart: Race_Racer_Kart, session: Session) -> Race_Racer_Kart:
@@ -131,27 +472,462 @@ def create_race_racer_kart(race_racer_kart: Race_Racer_Kart, session: Session) -
     Создание связи между гонкой, гонщиком и картом
     """
     session.add(race_racer_kart)
+    update_derived(session, [race_racer_kart])
     session.commit()
     session.refresh(race_racer_kart)
     return race_racer_kart
 
 
+def existing_ids(session: Session, model: type[SQLModel], ids: Iterable[int]) -> set[int]:
+    """Вернуть те ID из переданных, которые есть в таблице"""
+    ids = list(set(ids))
+    found = set()
+    for start in range(0, len(ids), ID_CHUNK_SIZE):
+        chunk = ids[start:start + ID_CHUNK_SIZE]
+        found.update(session.exec(select(model.id).where(model.id.in_(chunk))).all())
+    return found
+
+
+def check_references(session: Session, results: Sequence[RaceResultBase]) -> dict[int, str]:
+    """
+    Проверить ссылки результатов на гонки, гонщиков и карты (несколько запросов на весь пакет)
+    Возвращает {номер результата: описание ошибки} для результатов с несуществующими ссылками
+    """
+    races = existing_ids(session, Races, (result.race_id for result in results))
+    racers = existing_ids(session, Racers, (result.racer_id for result in results))
+    karts = existing_ids(session, Karts, (result.kart_id for result in results))
+
+    errors = {}
+    for index, result in enumerate(results):
+        if result.race_id not in races:
+            errors[index] = f"Гонка с ID {result.race_id} не существует"
+        elif result.racer_id not in racers:
+            errors[index] = f"Гонщик с ID {result.racer_id} не существует"
+        elif result.kart_id not in karts:
+            errors[index] = f"Карт с ID {result.kart_id} не существует"
+    return errors
+
+
+def create_race_racer_karts(results: Sequence[RaceResultBase], session: Session) -> list[Race_Racer_Kart | str]:
+    """
+    Пакетная запись результатов гонок одной транзакцией, возвращает сохраненные строки с ID
+    Ссылки на гонки, гонщиков и карты проверяются несколькими запросами на весь пакет,
+    на месте результата с несуществующими ссылками - описание ошибки.
+    Вставка - INSERT ... RETURNING id пачками многострочных VALUES (insertmanyvalues),
+    sort_by_parameter_order: ID приходят в порядке переданных строк
+    """
+    reference_errors = check_references(session, results)
+    values = [result.model_dump() for index, result in enumerate(results) if index not in reference_errors]
+    rows = []
+    if values:
+        statement = insert(Race_Racer_Kart).returning(Race_Racer_Kart.id, sort_by_parameter_order=True)
+        ids = session.execute(statement, values).scalars().all()
+        rows = [Race_Racer_Kart(id=row_id, **value) for row_id, value in zip(ids, values)]
+        update_derived(session, rows)
+        session.commit()
+    saved = iter(rows)
+    return [reference_errors[index] if index in reference_errors else next(saved) for index in range(len(results))]
+
+
 def get_race_results(session: Session, race_id: int) -> Sequence[Race_Racer_Kart]:
     """
     Получение всех результатов гонки с информацией о гонщиках и картах
     """
     statement = select(Race_Racer_Kart).where(Race_Racer_Kart.race_id == race_id)
-    return session.exec(statement).all()
+    results = session.exec(statement).all()
+    if results:
+        return results
+    # Гонка переносится в архив целиком, так что результаты либо все в основной таблице, либо все в архиве
+    statement = select(Race_Racer_Kart_Archive).where(Race_Racer_Kart_Archive.race_id == race_id)
+    return [from_archive(Race_Racer_Kart, result) for result in session.exec(statement)]
 
 
 def get_racer_history(session: Session, racer_id: int) -> Sequence[Race_Racer_Kart]:
     """
-    Получение истории гонок гонщика
+    Получение истории гонок гонщика (архивные результаты - в начале)
     """
+    archived = session.exec(select(Race_Racer_Kart_Archive).where(Race_Racer_Kart_Archive.racer_id == racer_id))
     statement = select(Race_Racer_Kart).where(Race_Racer_Kart.racer_id == racer_id)
+    return [from_archive(Race_Racer_Kart, result) for result in archived] + list(session.exec(statement))
+
+
+def get_race_results_rows(session: Session, race_id: int) -> list[dict]:
+    """Результаты гонки словарями (FAST_JSON)"""
+    statement = select(*model_columns(Race_Racer_Kart)).where(Race_Racer_Kart.race_id == race_id)
+    rows = fetch_rows(session, Race_Racer_Kart, statement)
+    if rows:
+        return rows
+    statement = select(*model_columns(Race_Racer_Kart_Archive)).where(Race_Racer_Kart_Archive.race_id == race_id)
+    return fetch_rows(session, Race_Racer_Kart, statement)
+
+
+def get_racer_history_rows(session: Session, racer_id: int) -> list[dict]:
+    """История гонок гонщика словарями (FAST_JSON)"""
+    archived = select(*model_columns(Race_Racer_Kart_Archive)).where(Race_Racer_Kart_Archive.racer_id == racer_id)
+    statement = select(*model_columns(Race_Racer_Kart)).where(Race_Racer_Kart.racer_id == racer_id)
+    return fetch_rows(session, Race_Racer_Kart, archived) + fetch_rows(session, Race_Racer_Kart, statement)
+
+
+# ========== KART USAGE (обслуживание картов) ==========
+
+def upsert(session: Session, table):
+    """INSERT с поддержкой ON CONFLICT для диалекта БД сессии (PostgreSQL / SQLite)"""
+    dialect = postgresql if session.get_bind().dialect.name == "postgresql" else sqlite
+    return dialect.insert(table)
+
+
+def counts_for_tires(race_date: date | None, tires_change_date: date | None) -> bool:
+    """Заезд идет в счетчики резины, если он не раньше ее замены (без даты - считается)"""
+    return race_date is None or tires_change_date is None or race_date >= tires_change_date
+
+
+def update_kart_usage(session: Session, results: Sequence[RaceResultBase], race_dates: dict[int, date | None]) -> None:
+    """
+    Увеличить счетчики Kart_Usage на новые результаты (вызывается из update_derived)
+    INSERT ... ON CONFLICT DO UPDATE пачкой: без чтения существующих строк и без гонки
+    параллельных вставок одного карта
+    """
+    kart_ids = list({result.kart_id for result in results})
+    change_dates = {}
+    for start in range(0, len(kart_ids), ID_CHUNK_SIZE):
+        chunk = kart_ids[start:start + ID_CHUNK_SIZE]
+        change_dates.update(session.exec(select(Karts.id, Karts.tires_change_date).where(Karts.id.in_(chunk))).all())
+
+    totals = {kart_id: {"races": 0, "tire_races": 0, "tire_driven_us": 0} for kart_id in kart_ids}
+    for result in results:
+        total = totals[result.kart_id]
+        total["races"] += 1
+        if counts_for_tires(race_dates.get(result.race_id), change_dates.get(result.kart_id)):
+            total["tire_races"] += 1
+            total["tire_driven_us"] += duration_to_us(result.duration)
+
+    # Одна вставка пачкой: новые карты получают строку, у существующих счетчики увеличиваются
+    usage = Kart_Usage.__table__
+    statement = upsert(session, usage)
+    statement = statement.on_conflict_do_update(
+        index_elements=[usage.c.kart_id],
+        set_={
+            "races": usage.c.races + statement.excluded.races,
+            "tire_races": usage.c.tire_races + statement.excluded.tire_races,
+            "tire_driven_us": usage.c.tire_driven_us + statement.excluded.tire_driven_us,
+        },
+    )
+    session.execute(statement, [{"kart_id": kart_id, **totals[kart_id]} for kart_id in sorted(totals)])
+
+
+def reset_tire_usage(session: Session, kart_id: int) -> None:
+    """Обнулить счетчики резины карта (смена резины, вызывается до commit)"""
+    session.execute(
+        update(Kart_Usage).where(Kart_Usage.kart_id == kart_id).values(tire_races=0, tire_driven_us=0)
+    )
+
+
+def rebuild_kart_usage(session: Session) -> int:
+    """
+    Пересчитать Kart_Usage по всей истории (включая архив) одним запросом на стороне БД
+    Возвращает количество картов
+    """
+    history = union_all(*(
+        select(model.kart_id, type_coerce(model.duration, BigInteger).label("duration_us"), races.race_date)
+        .join(races, races.id == model.race_id)
+        for model, races in ((Race_Racer_Kart, Races), (Race_Racer_Kart_Archive, Races_Archive))
+    )).subquery()
+    for_tires = or_(history.c.race_date.is_(None), history.c.race_date >= Karts.tires_change_date)
+    statement = (
+        select(
+            Karts.id,
+            func.count(history.c.kart_id),
+            func.count(case((for_tires, history.c.kart_id))),
+            func.coalesce(func.sum(case((for_tires, history.c.duration_us))), 0),
+        )
+        .outerjoin(history, history.c.kart_id == Karts.id)
+        .group_by(Karts.id)
+    )
+    session.execute(delete(Kart_Usage))
+    session.execute(insert(Kart_Usage).from_select(["kart_id", "races", "tire_races", "tire_driven_us"], statement))
+    session.commit()
+    return session.exec(select(func.count()).select_from(Kart_Usage)).one()
+
+
+def get_karts_maintenance_due(session: Session, threshold_us: int, limit: int) -> list[KartMaintenance]:
+    """
+    Карты, проехавшие на текущей резине не меньше threshold_us, по убыванию пробега
+    Диапазон по индексу ix_kart_usage_tire_driven_us, история результатов не читается
+    """
+    statement = (
+        select(
+            Karts.id, Karts.model, Karts.state, Karts.tires, Karts.tires_change_date,
+            Kart_Usage.races, Kart_Usage.tire_races, Kart_Usage.tire_driven_us
+        )
+        .join(Karts, Karts.id == Kart_Usage.kart_id)
+        .where(Kart_Usage.tire_driven_us >= threshold_us)
+        .order_by(Kart_Usage.tire_driven_us.desc(), Kart_Usage.kart_id)
+        .limit(limit)
+    )
+    return [
+        KartMaintenance(
+            kart_id=kart_id, model=model, state=state, tires=tires, tires_change_date=tires_change_date,
+            races=races, tire_races=tire_races, tire_driven_minutes=round(tire_driven_us / 60_000_000, 1)
+        )
+        for kart_id, model, state, tires, tires_change_date, races, tire_races, tire_driven_us in session.exec(statement)
+    ]
+
+
+# ========== RACE DAYS ==========
+
+def get_track_best_times(session: Session, track_id: int, racer_ids: Sequence[int]) -> dict[int, time]:
+    """Лучшие времена гонщиков на трассе (по Best_Times, без чтения истории результатов)"""
+    bests = {}
+    for start in range(0, len(racer_ids), ID_CHUNK_SIZE):
+        chunk = racer_ids[start:start + ID_CHUNK_SIZE]
+        statement = (
+            select(Best_Times.racer_id, Best_Times.duration)
+            .where(Best_Times.track_id == track_id, Best_Times.racer_id.in_(chunk))
+        )
+        bests.update(session.exec(statement).all())
+    return bests
+
+
+def get_available_karts(session: Session) -> list[tuple[int, bool, int]]:
+    """Исправные карты: (kart_id, rain, заездов на карте)"""
+    statement = (
+        select(Karts.id, Karts.rain, func.coalesce(Kart_Usage.races, 0))
+        .outerjoin(Kart_Usage, Kart_Usage.kart_id == Karts.id)
+        .where(Karts.state.is_(True))
+        .order_by(Karts.id)
+    )
+    return [tuple(row) for row in session.exec(statement)]
+
+
+def create_race_day(session: Session, track_id: int, race_date: date | None, heats: Sequence[Sequence[int]],
+                    karts: Sequence[Sequence[int]], best_times: dict[int, time]) -> list[PlannedHeat]:
+    """
+    Создать заезды и регистрации гонщиков с картами одной транзакцией
+    heats[i][j] - гонщик, karts[i][j] - его карт в заезде i
+    """
+    races = [Races(track_id=track_id, race_date=race_date) for _ in heats]
+    session.add_all(races)
+    session.flush()  # ID заездов одной вставкой (RETURNING)
+
+    entries = [
+        {"race_id": race.id, "racer_id": racer_id, "kart_id": kart_id}
+        for race, heat, heat_karts in zip(races, heats, karts)
+        for racer_id, kart_id in zip(heat, heat_karts)
+    ]
+    session.execute(insert(Race_Entries), entries)
+    bump_table_version(session, "races")
+    session.commit()
+
+    return [
+        PlannedHeat(race_id=race.id, heat=number, entries=[
+            PlannedEntry(racer_id=racer_id, kart_id=kart_id, best_time=best_times.get(racer_id))
+            for racer_id, kart_id in zip(heat, heat_karts)
+        ])
+        for number, (race, heat, heat_karts) in enumerate(zip(races, heats, karts), start=1)
+    ]
+
+
+# ========== CLASSIFICATION ==========
+
+def classification_statement(model: type[SQLModel], races: type[SQLModel]):
+    """
+    Классификация одним запросом: место (RANK), отставание от лидера (FIRST_VALUE)
+    и от предыдущего (LAG) внутри каждой гонки. Окно идет по индексу (race_id, duration)
+    """
+    duration = type_coerce(model.duration, BigInteger)  # Разности считаются в микросекундах
+    window = {"partition_by": model.race_id, "order_by": duration}
+    position = func.rank().over(**window).label("position")
+    return (
+        select(
+            model.race_id, position, model.id, model.racer_id, model.kart_id, model.duration,
+            type_coerce(duration - func.first_value(duration).over(**window), Duration).label("gap_to_leader"),
+            type_coerce(duration - func.lag(duration).over(**window), Duration).label("gap_to_ahead"),
+        )
+        .join(races, races.id == model.race_id)
+        .order_by(races.race_date, model.race_id, position, model.id)
+    )
+
+
+def get_race_classification(session: Session, race_id: int) -> list[ClassificationEntry]:
+    """Классификация гонки (архивная гонка тоже находится)"""
+    for model, races in ((Race_Racer_Kart, Races), (Race_Racer_Kart_Archive, Races_Archive)):
+        statement = classification_statement(model, races).where(model.race_id == race_id)
+        entries = [ClassificationEntry(**row._mapping) for row in session.exec(statement)]
+        if entries:
+            return entries
+    return []
+
+
+def get_classification(session: Session, date_from: date, date_to: date) -> list[ClassificationEntry]:
+    """Классификации всех гонок за период (например, все заезды дня), архивные - в начале"""
+    entries = []
+    for model, races in ((Race_Racer_Kart_Archive, Races_Archive), (Race_Racer_Kart, Races)):
+        statement = classification_statement(model, races).where(races.race_date.between(date_from, date_to))
+        entries.extend(ClassificationEntry(**row._mapping) for row in session.exec(statement))
+    return entries
+
+
+# ========== BEST TIMES (лидерборды) ==========
+
+def personal_best_time():
+    """
+    Личный рекорд гонщика (Racers.best_time) - минимум его лучших времен на трассах
+    (индекс racer_id, track_id). Время, указанное при регистрации, действует только до первого
+    результата: дальше рекорд определяется историей, и при пересчете может стать больше
+    """
+    racers = Racers.__table__
+    bests = Best_Times.__table__
+    return select(func.min(bests.c.duration)).where(bests.c.racer_id == racers.c.id).scalar_subquery()
+
+
+def update_derived(session: Session, results: Sequence[RaceResultBase]) -> None:
+    """
+    Обновить производные данные для новых результатов: лучшие времена на трассах,
+    Racers.best_time и счетчики использования картов. Вызывается до commit,
+    чтобы попасть в ту же транзакцию
+    """
+    if not results:
+        return
+    race_ids = list({result.race_id for result in results})
+    races = session.exec(select(Races.id, Races.track_id, Races.race_date).where(Races.id.in_(race_ids))).all()
+    race_tracks = {race_id: track_id for race_id, track_id, _ in races}
+    race_dates = {race_id: race_date for race_id, _, race_date in races}
+
+    # Лучший из новых результатов для каждой пары (гонщик, трасса)
+    candidates: dict[tuple[int, int], RaceResultBase] = {}
+    for result in results:
+        key = (result.racer_id, race_tracks[result.race_id])
+        if key not in candidates or result.duration < candidates[key].duration:
+            candidates[key] = result
+
+    racer_ids = sorted({racer_id for racer_id, _ in candidates})
+    # Строки гонщиков блокируются до записи лучших времен (PostgreSQL, в порядке ID): параллельная
+    # запись результата того же гонщика ждет commit и затем видит наши лучшие времена
+    for start in range(0, len(racer_ids), ID_CHUNK_SIZE):
+        chunk = racer_ids[start:start + ID_CHUNK_SIZE]
+        session.exec(select(Racers.id).where(Racers.id.in_(chunk)).order_by(Racers.id).with_for_update()).all()
+
+    # Вставка или замена только более быстрым временем; условие проверяет БД, поэтому
+    # параллельные записи результатов не падают на уникальности (racer_id, track_id)
+    bests = Best_Times.__table__
+    statement = upsert(session, bests)
+    statement = statement.on_conflict_do_update(
+        index_elements=[bests.c.racer_id, bests.c.track_id],
+        set_={
+            "race_id": statement.excluded.race_id,
+            "kart_id": statement.excluded.kart_id,
+            "duration": statement.excluded.duration,
+        },
+        where=statement.excluded.duration < bests.c.duration,
+    )
+    session.execute(statement, [
+        {"racer_id": racer_id, "track_id": track_id, "race_id": result.race_id,
+         "kart_id": result.kart_id, "duration": result.duration}
+        for (racer_id, track_id), result in sorted(candidates.items(), key=lambda item: item[0])
+    ])
+
+    # Личный рекорд пересчитывается в БД по тому же определению, что и в rebuild_best_times
+    racers = Racers.__table__
+    for start in range(0, len(racer_ids), ID_CHUNK_SIZE):
+        chunk = racer_ids[start:start + ID_CHUNK_SIZE]
+        session.execute(update(racers).values(best_time=personal_best_time()).where(racers.c.id.in_(chunk)))
+
+    update_kart_usage(session, results, race_dates)
+
+
+def rebuild_best_times(session: Session) -> int:
+    """
+    Пересчитать таблицу лучших времен и Racers.best_time по всей истории результатов
+    (включая архив). Выполняется одним проходом на стороне БД, возвращает количество записей в таблице
+    """
+    history = union_all(*(
+        select(model.id, model.racer_id, races.track_id, model.race_id, model.kart_id, model.duration)
+        .join(races, races.id == model.race_id)
+        for model, races in ((Race_Racer_Kart, Races), (Race_Racer_Kart_Archive, Races_Archive))
+    )).subquery()
+    ranked = (
+        select(
+            history.c.racer_id, history.c.track_id, history.c.race_id, history.c.kart_id, history.c.duration,
+            func.row_number().over(
+                partition_by=(history.c.racer_id, history.c.track_id),
+                order_by=(history.c.duration, history.c.id)
+            ).label("place")
+        )
+        .subquery()
+    )
+    columns = ["racer_id", "track_id", "race_id", "kart_id", "duration"]
+    session.execute(delete(Best_Times))
+    session.execute(
+        insert(Best_Times).from_select(
+            columns,
+            select(*(ranked.c[column] for column in columns)).where(ranked.c.place == 1)
+        )
+    )
+
+    racers = Racers.__table__
+    bests = Best_Times.__table__
+    session.execute(
+        update(racers).values(best_time=personal_best_time()).where(exists().where(bests.c.racer_id == racers.c.id))
+    )
+    session.commit()
+    return session.exec(select(func.count()).select_from(Best_Times)).one()
+
+
+def get_track_leaderboard(session: Session, track_id: int, limit: int) -> Sequence[Best_Times]:
+    """Лучшие времена на трассе по возрастанию"""
+    statement = (
+        select(Best_Times)
+        .where(Best_Times.track_id == track_id)
+        .order_by(Best_Times.duration, Best_Times.id)
+        .limit(limit)
+    )
+    return session.exec(statement).all()
+
+
+def get_racer_bests(session: Session, racer_id: int) -> Sequence[Best_Times]:
+    """Лучшие времена гонщика на всех трассах"""
+    statement = select(Best_Times).where(Best_Times.racer_id == racer_id).order_by(Best_Times.track_id)
     return session.exec(statement).all()
 
 
+# ========== ANALYTICS ==========
+
+def get_results_columns(session: Session, racer_ids: Sequence[int]) -> list[tuple]:
+    """
+    Результаты гонщиков для аналитики (включая архив): кортежи (racer_id, race_id, kart_id, duration_us)
+    Все колонки - целые числа (длительность - сырые микросекунды), поэтому строки отдаются
+    напрямую из курсора драйвера, без объектов Row SQLAlchemy: их можно сразу читать в массив NumPy.
+    Трасса и дата берутся отдельно по гонкам (get_race_columns), без join на каждую строку
+    """
+    ids = list(set(racer_ids))
+    connection = session.connection()
+    rows = []
+    for model in (Race_Racer_Kart_Archive, Race_Racer_Kart):
+        for start in range(0, len(ids), ID_CHUNK_SIZE):
+            chunk = ids[start:start + ID_CHUNK_SIZE]
+            statement = (
+                select(model.racer_id, model.race_id, model.kart_id, type_coerce(model.duration, BigInteger))
+                .where(model.racer_id.in_(chunk))
+            )
+            result = connection.execute(statement)
+            try:
+                rows.extend(result.cursor.fetchall())
+            finally:
+                result.close()
+    return rows
+
+
+def get_race_columns(session: Session, race_ids: Sequence[int]) -> list[tuple]:
+    """Трасса и дата гонок (включая архив): кортежи (race_id, track_id, race_date)"""
+    rows = []
+    for races in (Races_Archive, Races):
+        for start in range(0, len(race_ids), ID_CHUNK_SIZE):
+            chunk = race_ids[start:start + ID_CHUNK_SIZE]
+            statement = select(races.id, races.track_id, races.race_date).where(races.id.in_(chunk))
+            rows.extend(session.connection().execute(statement).all())
+    return rows
+
+
 # ========== WORKERS ==========
 
 def read_all_workers(session: Session) -> Sequence[Workers]:
@@ -167,6 +943,302 @@ def create_worker(worker: Workers, session: Session) -> Workers:
     return worker
 
 
+def _find_assignments(session: Session, pairs: list[tuple[int, int]]) -> set[tuple[int, int]]:
+    """Какие из пар (worker_id, race_id) уже есть в workers_race"""
+    found = set()
+    for start in range(0, len(pairs), ID_CHUNK_SIZE // 2):
+        chunk = pairs[start:start + ID_CHUNK_SIZE // 2]
+        statement = (
+            select(Workers_Race.worker_id, Workers_Race.race_id)
+            .where(tuple_(Workers_Race.worker_id, Workers_Race.race_id).in_(chunk))
+        )
+        found.update(tuple(row) for row in session.exec(statement))
+    return found
+
+
+def assign_workers(session: Session, assignments: Sequence[WorkerAssignment]) -> WorkerAssignmentReport:
+    """Назначить работников на гонки одной вставкой; уже существующие назначения пропускаются"""
+    pairs = list({(item.worker_id, item.race_id) for item in assignments})
+    existing = _find_assignments(session, pairs)
+    new = [{"worker_id": worker_id, "race_id": race_id} for worker_id, race_id in pairs
+           if (worker_id, race_id) not in existing]
+    if new:
+        session.execute(insert(Workers_Race), new)
+    session.commit()
+    return WorkerAssignmentReport(changed=len(new), skipped=len(assignments) - len(new))
+
+
+def unassign_workers(session: Session, assignments: Sequence[WorkerAssignment]) -> WorkerAssignmentReport:
+    """Снять работников с гонок (DELETE по парам worker_id, race_id)"""
+    pairs = list({(item.worker_id, item.race_id) for item in assignments})
+    removed = 0
+    for start in range(0, len(pairs), ID_CHUNK_SIZE // 2):
+        chunk = pairs[start:start + ID_CHUNK_SIZE // 2]
+        result = session.execute(
+            delete(Workers_Race).where(tuple_(Workers_Race.worker_id, Workers_Race.race_id).in_(chunk))
+        )
+        removed += result.rowcount
+    session.commit()
+    return WorkerAssignmentReport(changed=removed, skipped=max(len(assignments) - removed, 0))
+
+
+# ========== STAFF REPORTS ==========
+
+# Формат периода: SQLite strftime / PostgreSQL to_char
+PERIOD_FORMATS = {
+    "day": ("%Y-%m-%d", "YYYY-MM-DD"),
+    "month": ("%Y-%m", "YYYY-MM"),
+    "year": ("%Y", "YYYY"),
+}
+
+
+def staff_assignments(date_from: date | None, date_to: date | None):
+    """
+    Назначения (worker_id, race_id, race_date) из основной и архивной таблиц (UNION ALL)
+    Фильтр по дате применяется в каждой части, чтобы работал индекс по races.race_date
+    """
+    parts = []
+    for model, races in ((Workers_Race, Races), (Workers_Race_Archive, Races_Archive)):
+        statement = (
+            select(model.worker_id, model.race_id, races.race_date)
+            .join(races, races.id == model.race_id)
+        )
+        if date_from is not None:
+            statement = statement.where(races.race_date >= date_from)
+        if date_to is not None:
+            statement = statement.where(races.race_date <= date_to)
+        parts.append(statement)
+    return union_all(*parts).subquery()
+
+
+def period_label(session: Session, column, period: str):
+    """
+    Начало периода даты строкой (для группировки)
+    Формат - константа в тексте запроса, а не параметр: иначе PostgreSQL не узнает
+    выражение из SELECT в GROUP BY
+    """
+    sqlite_format, postgresql_format = PERIOD_FORMATS[period]
+    if session.get_bind().dialect.name == "postgresql":
+        return func.to_char(column, literal_column(f"'{postgresql_format}'"))
+    return func.strftime(literal_column(f"'{sqlite_format}'"), column)
+
+
+def get_worker_races_by_period(session: Session, period: str, date_from: date | None = None,
+                               date_to: date | None = None) -> list[WorkerPeriodRaces]:
+    """Количество гонок каждого работника по периодам (агрегат на стороне БД)"""
+    staff = staff_assignments(date_from, date_to)
+    label = period_label(session, staff.c.race_date, period).label("period")
+    statement = (
+        select(Workers.id, Workers.name, label, func.count(staff.c.race_id.distinct()))
+        .join(staff, staff.c.worker_id == Workers.id)
+        .where(staff.c.race_date.is_not(None))
+        .group_by(Workers.id, Workers.name, label)
+        .order_by(Workers.id, label)
+    )
+    return [
+        WorkerPeriodRaces(worker_id=worker_id, name=name, period=period_, races=races)
+        for worker_id, name, period_, races in session.exec(statement)
+    ]
+
+
+def get_worker_double_bookings(session: Session, date_from: date | None = None,
+                               date_to: date | None = None) -> list[WorkerDoubleBooking]:
+    """Работники, назначенные на несколько разных гонок в один день"""
+    staff = staff_assignments(date_from, date_to)
+    statement = (
+        select(
+            Workers.id, Workers.name, staff.c.race_date,
+            func.aggregate_strings(cast(staff.c.race_id, String), ",")
+        )
+        .join(staff, staff.c.worker_id == Workers.id)
+        .where(staff.c.race_date.is_not(None))
+        .group_by(Workers.id, Workers.name, staff.c.race_date)
+        .having(func.count(staff.c.race_id.distinct()) > 1)
+        .order_by(staff.c.race_date, Workers.id)
+    )
+    return [
+        WorkerDoubleBooking(worker_id=worker_id, name=name, race_date=race_date,
+                            race_ids=sorted({int(race_id) for race_id in race_ids.split(",")}))
+        for worker_id, name, race_date, race_ids in session.exec(statement)
+    ]
+
+
+def get_payroll(session: Session, basis: str, date_from: date | None = None,
+                date_to: date | None = None) -> list[WorkerPayroll]:
+    """
+    Оценка выплат за период по Workers.salary
+    basis="month" - оклад за каждый месяц, в котором работник обслуживал гонки,
+    basis="race" - ставка за каждую обслуженную гонку
+    """
+    staff = staff_assignments(date_from, date_to)
+    races = func.count(staff.c.race_id.distinct())
+    months = func.count(period_label(session, staff.c.race_date, "month").distinct())
+    statement = (
+        select(Workers.id, Workers.name, Workers.status, Workers.salary, races, months)
+        .join(staff, staff.c.worker_id == Workers.id)
+        .group_by(Workers.id, Workers.name, Workers.status, Workers.salary)
+        .order_by(Workers.id)
+    )
+    return [
+        WorkerPayroll(worker_id=worker_id, name=name, status=status, races=races_, months=months_, salary=salary,
+                      amount=round(salary * (months_ if basis == "month" else races_), 2))
+        for worker_id, name, status, salary, races_, months_ in session.exec(statement)
+    ]
+
+
+# ========== PAGINATION ==========
+
+def read_page(session: Session, model: type[SQLModel], limit: int,
+              after: int | None = None) -> tuple[Sequence[SQLModel], int | None]:
+    """
+    Получить страницу записей таблицы (keyset-пагинация по id)
+    Возвращает записи и курсор следующей страницы (None - если страниц больше нет)
+    """
+    statement = select(model).order_by(model.id).limit(limit + 1)
+    if after is not None:
+        statement = statement.where(model.id > after)
+    rows = session.exec(statement).all()
+    if len(rows) > limit:
+        return rows[:limit], rows[limit - 1].id
+    return rows, None
+
+
+def model_columns(model: type[SQLModel]) -> list:
+    """Колонки таблицы в порядке полей модели"""
+    return [model.__table__.c[name] for name in model.model_fields]
+
+
+def fetch_rows(session: Session, model: type[SQLModel], statement) -> list[dict]:
+    """
+    Выполнить select(*model_columns(model)) и вернуть строки словарями
+    Без ORM объектов: быстрый путь для больших списков (FAST_JSON)
+    """
+    names = list(model.model_fields)
+    return [dict(zip(names, row)) for row in session.exec(statement)]
+
+
+def read_page_rows(session: Session, model: type[SQLModel], limit: int,
+                   after: int | None = None) -> tuple[list[dict], int | None]:
+    """То же, что read_page, но строки возвращаются словарями"""
+    statement = select(*model_columns(model)).order_by(model.id).limit(limit + 1)
+    if after is not None:
+        statement = statement.where(model.id > after)
+    rows = fetch_rows(session, model, statement)
+    if len(rows) > limit:
+        return rows[:limit], rows[limit - 1]["id"]
+    return rows, None
+
+
+def iter_all(session: Session, model: type[SQLModel], chunk_size: int = 500) -> Iterator[SQLModel]:
+    """
+    Перебрать все записи таблицы порциями по chunk_size строк
+    Память не зависит от размера таблицы
+    """
+    statement = select(model).order_by(model.id).execution_options(yield_per=chunk_size)
+    yield from session.exec(statement)
+
+
+# ========== ARCHIVE ==========
+
+# Основная таблица -> архивная, колонка со ссылкой на гонку
+ARCHIVE_TABLES = (
+    (Races, Races_Archive, "id"),
+    (Race_Racer_Kart, Race_Racer_Kart_Archive, "race_id"),
+    (Workers_Race, Workers_Race_Archive, "race_id"),
+)
+
+
+def from_archive(model: type[SQLModel], row: SQLModel | None) -> SQLModel | None:
+    """Архивная запись как объект основной модели (для прозрачного чтения)"""
+    return None if row is None else model(**row.model_dump())
+
+
+def archivable_race_ids(session: Session, before: date) -> list[int]:
+    """
+    ID гонок раньше before, которые можно перенести в архив
+    В SQLite новый ID без AUTOINCREMENT - это max(id) + 1, поэтому гонка, которой принадлежит
+    максимальный ID в любой из таблиц, не переносится: иначе ее ID достался бы новой записи
+    """
+    keep = {session.exec(select(func.max(Races.id))).one()}
+    for model in (Race_Racer_Kart, Workers_Race):
+        keep.add(session.exec(select(model.race_id).order_by(model.id.desc()).limit(1)).first())
+    statement = select(Races.id).where(Races.race_date < before).order_by(Races.id)
+    return [race_id for race_id in session.exec(statement) if race_id not in keep]
+
+
+def archive_races(session: Session, before: date, chunk_size: int = ID_CHUNK_SIZE,
+                  progress: Callable[[int, int], None] | None = None) -> int:
+    """
+    Перенести гонки раньше before вместе с результатами и персоналом в архивные таблицы
+    Порция из chunk_size гонок - одна транзакция (INSERT ... SELECT и DELETE на стороне БД)
+    Возвращает количество перенесенных гонок
+    """
+    race_ids = archivable_race_ids(session, before)
+    for start in range(0, len(race_ids), chunk_size):
+        chunk = race_ids[start:start + chunk_size]
+        for model, archive, column in ARCHIVE_TABLES:
+            columns = [c.name for c in model.__table__.c]
+            source = select(*(model.__table__.c[name] for name in columns)).where(model.__table__.c[column].in_(chunk))
+            session.execute(insert(archive.__table__).from_select(columns, source))
+        # Предварительные регистрации прошедших заездов не архивируются
+        session.execute(delete(Race_Entries).where(Race_Entries.race_id.in_(chunk)))
+        for model, _, column in reversed(ARCHIVE_TABLES):
+            session.execute(delete(model.__table__).where(model.__table__.c[column].in_(chunk)))
+        bump_table_version(session, "races")
+        session.commit()
+        if progress is not None:
+            progress(start + len(chunk), len(race_ids))
+    return len(race_ids)
+
+
+# ========== EXPORT ==========
+
+EXPORT_COLUMNS = (
+    "id", "race_id", "race_date", "track_id", "track_name",
+    "racer_id", "racer_name", "kart_id", "kart_model", "duration"
+)
+
+
+def export_statements(chunk_size: int, date_from: date | None = None, date_to: date | None = None,
+                      racer_id: int | None = None) -> list:
+    """
+    Запросы выгрузки результатов (колонки EXPORT_COLUMNS): архив, затем основные таблицы
+    yield_per - строки читаются через серверный курсор порциями по chunk_size
+    """
+    statements = []
+    for model, races in ((Race_Racer_Kart_Archive, Races_Archive), (Race_Racer_Kart, Races)):
+        statement = (
+            select(
+                model.id, model.race_id, races.race_date, races.track_id, Tracks.name,
+                model.racer_id, Racers.name, model.kart_id, Karts.model, model.duration
+            )
+            .join(races, races.id == model.race_id)
+            .join(Tracks, Tracks.id == races.track_id)
+            .join(Racers, Racers.id == model.racer_id)
+            .join(Karts, Karts.id == model.kart_id)
+            .order_by(model.id)
+            .execution_options(yield_per=chunk_size)
+        )
+        if date_from is not None:
+            statement = statement.where(races.race_date >= date_from)
+        if date_to is not None:
+            statement = statement.where(races.race_date <= date_to)
+        if racer_id is not None:
+            statement = statement.where(model.racer_id == racer_id)
+        statements.append(statement)
+    return statements
+
+
+def iter_export_results(session: Session, chunk_size: int, date_from: date | None = None,
+                        date_to: date | None = None, racer_id: int | None = None) -> Iterator[Sequence[tuple]]:
+    """
+    Результаты гонок вместе с датой, трассой, гонщиком и картом (колонки EXPORT_COLUMNS),
+    архивные - в начале. Отдаются порциями по chunk_size строк, память не зависит от числа строк
+    """
+    for statement in export_statements(chunk_size, date_from, date_to, racer_id):
+        yield from session.exec(statement).partitions()
+
+
 #----------------
 
 #def read_all_karts(session: Session) -> list[Karts]:
@@ -0,0 +1,160 @@
+"""
+Асинхронные версии запросов из request.py (режим DB_MODE=async)
+"""
+from sqlmodel import SQLModel, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from datetime import date
+from typing import AsyncIterator, Sequence
+
+from cache import entity_cache
+from request import export_statements, from_archive, model_columns
+from model import Karts, Races, Tracks, Race_Racer_Kart, Table_Versions, Races_Archive, Race_Racer_Kart_Archive
+
+
+# ========== PAGINATION ==========
+
+async def read_page(session: AsyncSession, model: type[SQLModel], limit: int,
+                    after: int | None = None) -> tuple[Sequence[SQLModel], int | None]:
+    """
+    Получить страницу записей таблицы (keyset-пагинация по id)
+    Возвращает записи и курсор следующей страницы (None - если страниц больше нет)
+    """
+    statement = select(model).order_by(model.id).limit(limit + 1)
+    if after is not None:
+        statement = statement.where(model.id > after)
+    rows = (await session.exec(statement)).all()
+    if len(rows) > limit:
+        return rows[:limit], rows[limit - 1].id
+    return rows, None
+
+
+async def fetch_rows(session: AsyncSession, model: type[SQLModel], statement) -> list[dict]:
+    """
+    Выполнить select(*model_columns(model)) и вернуть строки словарями (FAST_JSON)
+    """
+    names = list(model.model_fields)
+    return [dict(zip(names, row)) for row in await session.exec(statement)]
+
+
+async def read_page_rows(session: AsyncSession, model: type[SQLModel], limit: int,
+                         after: int | None = None) -> tuple[list[dict], int | None]:
+    """То же, что read_page, но строки возвращаются словарями"""
+    statement = select(*model_columns(model)).order_by(model.id).limit(limit + 1)
+    if after is not None:
+        statement = statement.where(model.id > after)
+    rows = await fetch_rows(session, model, statement)
+    if len(rows) > limit:
+        return rows[:limit], rows[limit - 1]["id"]
+    return rows, None
+
+
+async def iter_all(session: AsyncSession, model: type[SQLModel], chunk_size: int = 500) -> AsyncIterator[SQLModel]:
+    """
+    Перебрать все записи таблицы порциями по chunk_size строк
+    """
+    statement = select(model).order_by(model.id).execution_options(yield_per=chunk_size)
+    async for row in await session.stream_scalars(statement):
+        yield row
+
+
+# ========== TABLE VERSIONS (условные GET) ==========
+
+async def read_table_version(session: AsyncSession, name: str) -> Table_Versions | None:
+    """Получить текущую версию таблицы"""
+    return await session.get(Table_Versions, name)
+
+
+# ========== KARTS ==========
+
+async def read_kart_by_id(session: AsyncSession, kart_id: int, version: int | None = None,
+                          cached: bool = True) -> Karts | None:
+    """Получить карт по ID (через кэш)"""
+    kart = entity_cache.get(Karts, kart_id, version) if cached else None
+    if kart is None:
+        kart = await session.get(Karts, kart_id)
+        entity_cache.put(kart, version)
+    return kart
+
+
+# ========== TRACKS ==========
+
+async def read_track_by_id(session: AsyncSession, track_id: int, version: int | None = None,
+                           cached: bool = True) -> Tracks | None:
+    """Получить трассу по ID (через кэш)"""
+    track = entity_cache.get(Tracks, track_id, version) if cached else None
+    if track is None:
+        track = await session.get(Tracks, track_id)
+        entity_cache.put(track, version)
+    return track
+
+
+# ========== RACES ==========
+
+async def read_race_by_id(session: AsyncSession, race_id: int, version: int | None = None,
+                          cached: bool = True) -> Races | None:
+    """Получить гонку по ID (через кэш), в том числе из архива"""
+    race = entity_cache.get(Races, race_id, version) if cached else None
+    if race is None:
+        race = await session.get(Races, race_id) or from_archive(Races, await session.get(Races_Archive, race_id))
+        entity_cache.put(race, version)
+    return race
+
+
+async def get_races_by_track(session: AsyncSession, track_id: int) -> Sequence[Races]:
+    """Получить все гонки на определенной трассе (архивные - в начале)"""
+    archived = await session.exec(select(Races_Archive).where(Races_Archive.track_id == track_id))
+    races = [from_archive(Races, race) for race in archived]
+    statement = select(Races).where(Races.track_id == track_id)
+    return races + list(await session.exec(statement))
+
+
+# ========== RACE_RACER_KART (связующая таблица) ==========
+
+async def get_race_results(session: AsyncSession, race_id: int) -> Sequence[Race_Racer_Kart]:
+    """
+    Получение всех результатов гонки
+    """
+    statement = select(Race_Racer_Kart).where(Race_Racer_Kart.race_id == race_id)
+    results = (await session.exec(statement)).all()
+    if results:
+        return results
+    statement = select(Race_Racer_Kart_Archive).where(Race_Racer_Kart_Archive.race_id == race_id)
+    return [from_archive(Race_Racer_Kart, result) for result in await session.exec(statement)]
+
+
+async def get_racer_history(session: AsyncSession, racer_id: int) -> Sequence[Race_Racer_Kart]:
+    """
+    Получение истории гонок гонщика (архивные результаты - в начале)
+    """
+    archived = await session.exec(select(Race_Racer_Kart_Archive).where(Race_Racer_Kart_Archive.racer_id == racer_id))
+    results = [from_archive(Race_Racer_Kart, result) for result in archived]
+    statement = select(Race_Racer_Kart).where(Race_Racer_Kart.racer_id == racer_id)
+    return results + list(await session.exec(statement))
+
+
+async def get_race_results_rows(session: AsyncSession, race_id: int) -> list[dict]:
+    """Результаты гонки словарями (FAST_JSON)"""
+    statement = select(*model_columns(Race_Racer_Kart)).where(Race_Racer_Kart.race_id == race_id)
+    rows = await fetch_rows(session, Race_Racer_Kart, statement)
+    if rows:
+        return rows
+    statement = select(*model_columns(Race_Racer_Kart_Archive)).where(Race_Racer_Kart_Archive.race_id == race_id)
+    return await fetch_rows(session, Race_Racer_Kart, statement)
+
+
+async def get_racer_history_rows(session: AsyncSession, racer_id: int) -> list[dict]:
+    """История гонок гонщика словарями (FAST_JSON)"""
+    archived = select(*model_columns(Race_Racer_Kart_Archive)).where(Race_Racer_Kart_Archive.racer_id == racer_id)
+    statement = select(*model_columns(Race_Racer_Kart)).where(Race_Racer_Kart.racer_id == racer_id)
+    return await fetch_rows(session, Race_Racer_Kart, archived) + await fetch_rows(session, Race_Racer_Kart, statement)
+
+
+# ========== EXPORT ==========
+
+async def iter_export_results(session: AsyncSession, chunk_size: int, date_from: date | None = None,
+                              date_to: date | None = None, racer_id: int | None = None) -> AsyncIterator[Sequence[tuple]]:
+    """Результаты гонок порциями по chunk_size строк (см. request.iter_export_results)"""
+    for statement in export_statements(chunk_size, date_from, date_to, racer_id):
+        result = await session.stream(statement)
+        async for chunk in result.partitions():
+            yield chunk
@@ -0,0 +1,43 @@
+"""
+Общие фикстуры тестов: временная SQLite БД со схемой и миграциями приложения
+"""
+import sys
+from pathlib import Path
+
+import pytest
+from sqlmodel import Session, create_engine
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import migrations  # noqa: E402
+
+
+@pytest.fixture
+def engine(tmp_path):
+    """Пустая БД в файле, подготовленная так же, как при запуске приложения"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    migrations.init_schema(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def session(engine):
+    with Session(engine) as session:
+        yield session
+
+
+@pytest.fixture
+def client(engine, monkeypatch):
+    """TestClient без lifespan (без начальных данных), запросы идут в тестовую БД"""
+    from fastapi.testclient import TestClient
+
+    import api
+    import database
+    from cache import entity_cache
+
+    # Engines создаются лениво (database.lazy_engine): подставляем тестовый вместо основного и реплики
+    monkeypatch.setattr(database, "engine", engine, raising=False)
+    monkeypatch.setattr(database, "read_engine", engine, raising=False)
+    entity_cache.clear()  # Кэш общий на процесс, а ID в тестовых БД повторяются
+    return TestClient(api.app)
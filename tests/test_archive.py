@@ -0,0 +1,81 @@
+"""
+Чтение после archive_races: архивная гонка доступна через те же endpoints, что и текущая
+"""
+import csv
+import io
+from datetime import date, time
+
+import pytest
+
+import request as req
+from model import Karts, Races, Racers, Race_Racer_Kart, Tracks, Workers, Workers_Race
+
+
+@pytest.fixture
+def archived(session):
+    """Прошлогодняя гонка (в архиве) и текущая; возвращает (ID архивной гонки, ID гонщика)"""
+    track = Tracks(name="Old Track", state=True, open=True, length=1.0)
+    racer = Racers(name="Ivan Petrov", club_card=True, date_of_birth=date(1995, 5, 15),
+                   date_of_registration=date(2023, 1, 10), best_time=time(0, 2))
+    kart = Karts(model="SuperKart X1", state=True, tires="Soft", tires_change_date=date(2024, 1, 1), rain=False)
+    worker = Workers(name="Marshal", date_of_birth=date(1990, 1, 1), status="marshal", salary=50000)
+    session.add_all([track, racer, kart, worker])
+    session.flush()
+    old = Races(track_id=track.id, race_date=date(2024, 6, 1))
+    current = Races(track_id=track.id, race_date=date(2025, 6, 1))
+    session.add_all([old, current])
+    session.flush()
+    session.add_all([
+        Race_Racer_Kart(race_id=old.id, racer_id=racer.id, kart_id=kart.id, duration=time(0, 1, 31)),
+        Race_Racer_Kart(race_id=old.id, racer_id=racer.id, kart_id=kart.id, duration=time(0, 1, 29)),
+        Workers_Race(worker_id=worker.id, race_id=old.id),
+        # Максимальные ID у текущей гонки: гонка с последним ID не архивируется (см. archivable_race_ids)
+        Race_Racer_Kart(race_id=current.id, racer_id=racer.id, kart_id=kart.id, duration=time(0, 1, 30)),
+        Workers_Race(worker_id=worker.id, race_id=current.id),
+    ])
+    session.commit()
+    ids = old.id, racer.id
+    assert req.archive_races(session, date(2025, 1, 1)) == 1
+    return ids
+
+
+def test_archived_race(client, archived):
+    race_id, _ = archived
+
+    assert client.get(f"/races/{race_id}").status_code == 200
+
+
+def test_archived_race_full(client, archived):
+    race_id, racer_id = archived
+
+    response = client.get(f"/races/{race_id}/full")
+
+    assert response.status_code == 200
+    detail = response.json()
+    assert detail["track"]["name"] == "Old Track"
+    assert [result["duration"] for result in detail["race_racer_karts"]] == ["00:01:29", "00:01:31"]
+    assert detail["race_racer_karts"][0]["racer"]["id"] == racer_id
+    assert detail["race_racer_karts"][0]["kart"]["model"] == "SuperKart X1"
+    assert [assignment["worker"]["name"] for assignment in detail["workers_races"]] == ["Marshal"]
+
+
+def test_export_includes_archive(client, archived):
+    race_id, _ = archived
+
+    response = client.get("/export/results", params={"to": "2024-12-31"})
+
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [int(row["race_id"]) for row in rows] == [race_id, race_id]
+
+
+def test_racer_stats_include_archive(client, archived):
+    pytest.importorskip("numpy")
+    _, racer_id = archived
+
+    stats = client.get(f"/racers/{racer_id}/stats").json()
+
+    assert stats["races"] == 3
+    # Трасса и дата подставляются по гонке, архивной и текущей
+    [track] = stats["tracks"]
+    assert (track["best"], track["median"]) == ("00:01:29", "00:01:30")
+    assert track["trend"] == 0.0  # Среднее 1:30 в обеих гонках
@@ -0,0 +1,95 @@
+"""
+Режим DB_MODE=async: запись и читающие endpoints с сессией БД идут через AsyncSession (aiosqlite)
+"""
+import csv
+import inspect
+import io
+
+import pytest
+from fastapi import FastAPI
+from fastapi.routing import APIRoute
+
+pytest.importorskip("aiosqlite")
+
+import api  # noqa: E402
+import api_async  # noqa: E402
+import database  # noqa: E402
+
+
+@pytest.fixture
+def async_client(engine, monkeypatch):
+    """Копия приложения с асинхронными маршрутами, как при DB_MODE=async, на тестовой БД"""
+    from fastapi.testclient import TestClient
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    from cache import entity_cache
+
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{engine.url.database}")
+    monkeypatch.setattr(database, "engine", engine, raising=False)
+    monkeypatch.setattr(database, "read_engine", engine, raising=False)
+    monkeypatch.setattr(database, "async_engine", async_engine, raising=False)
+    monkeypatch.setattr(database, "async_read_engine", async_engine, raising=False)
+    entity_cache.clear()
+    app = FastAPI()
+    app.router.routes = list(api.app.router.routes)
+    api_async.use_async_routes(app, api_async.router)
+    with TestClient(app) as client:  # Один event loop на все запросы: соединения пула привязаны к нему
+        yield client
+        client.portal.call(async_engine.dispose)
+
+
+def test_no_sync_sessions_left(async_client):
+    for route in async_client.app.router.routes:
+        if not isinstance(route, APIRoute):
+            continue
+        dependencies = {getattr(parameter.default, "dependency", None)
+                        for parameter in inspect.signature(route.endpoint).parameters.values()}
+        assert not dependencies & {database.get_session, database.get_read_session}, route.path
+
+
+def test_write_and_read_paths(async_client):
+    client = async_client
+    track = client.post("/tracks", json={"name": "Track", "state": True, "open": True, "length": 1.0}).json()
+    kart = client.post("/karts", json={"model": "Kart", "state": True, "tires": "Soft",
+                                       "tires_change_date": "2025-01-01", "rain": False}).json()
+    racer = client.post("/racers", json={"name": "Ivan Petrov", "club_card": True, "date_of_birth": "1995-05-15",
+                                         "date_of_registration": "2023-01-10", "best_time": "00:02:00"}).json()
+    race = client.post("/races", json={"track_id": track["id"], "race_date": "2025-06-01"}).json()
+    assert client.post("/races", json={"track_id": track["id"] + 1}).status_code == 400
+
+    result = {"race_id": race["id"], "racer_id": racer["id"], "kart_id": kart["id"]}
+    report = client.post("/race-results/batch", json=[
+        {**result, "duration": "00:01:31"}, {**result, "duration": "00:01:29"}, "bad",
+    ]).json()
+    assert (report["inserted"], [error["index"] for error in report["errors"]]) == (2, [2])
+
+    leaderboard = client.get(f"/tracks/{track['id']}/leaderboard").json()
+    assert [row["duration"] for row in leaderboard] == ["00:01:29"]
+    full = client.get(f"/races/{race['id']}/full").json()
+    assert [row["duration"] for row in full["race_racer_karts"]] == ["00:01:29", "00:01:31"]
+    assert [row["name"] for row in client.get("/racers/search", params={"q": "ivn"}).json()] == ["Ivan Petrov"]
+    assert client.get(f"/races/{race['id'] + 1}/full").status_code == 404
+
+    rows = list(csv.DictReader(io.StringIO(client.get("/export/results").text)))
+    assert [row["duration"] for row in rows] == ["00:01:31", "00:01:29"]
+
+
+def test_racer_stats(async_client):
+    pytest.importorskip("numpy")
+    client = async_client
+    track = client.post("/tracks", json={"name": "Track", "state": True, "open": True, "length": 1.0}).json()
+    kart = client.post("/karts", json={"model": "Kart", "state": True, "tires": "Soft",
+                                       "tires_change_date": "2025-01-01", "rain": False}).json()
+    racer = client.post("/racers", json={"name": "Anna", "club_card": True, "date_of_birth": "1998-08-20",
+                                         "date_of_registration": "2023-03-15", "best_time": "00:02:00"}).json()
+    race = client.post("/races", json={"track_id": track["id"], "race_date": "2025-06-01"}).json()
+    client.post("/race-results/batch", json=[
+        {"race_id": race["id"], "racer_id": racer["id"], "kart_id": kart["id"], "duration": duration}
+        for duration in ("00:01:30", "00:01:32")
+    ])
+
+    stats = client.get(f"/racers/{racer['id']}/stats").json()
+
+    assert stats["races"] == 2
+    assert stats["tracks"][0]["mean"] == "00:01:31"
+    assert client.get("/analytics/racers", params={"ids": f"{racer['id']},999"}).json()[0]["racer_id"] == racer["id"]
@@ -0,0 +1,45 @@
+"""
+Лучшие времена: запись результата и полный пересчет дают одинаковые Best_Times и Racers.best_time
+"""
+from datetime import date, time
+
+from sqlmodel import select
+
+import request as req
+from model import Best_Times, Karts, Races, Racers, Race_Racer_Kart, Tracks
+
+
+def snapshot(session):
+    bests = session.exec(select(Best_Times.racer_id, Best_Times.track_id, Best_Times.duration)
+                         .order_by(Best_Times.racer_id, Best_Times.track_id)).all()
+    racers = session.exec(select(Racers.id, Racers.best_time).order_by(Racers.id)).all()
+    return bests, racers
+
+
+def test_incremental_matches_rebuild(session):
+    tracks = [Tracks(name=f"Track {number}", state=True, open=True, length=1.0) for number in range(2)]
+    # Время при регистрации лучше любого результата: после первого результата рекорд - из истории
+    racers = [Racers(name=f"Racer {number}", club_card=False, date_of_birth=date(2000, 1, 1),
+                     date_of_registration=date(2024, 1, 1), best_time=time(0, 0, 50)) for number in range(2)]
+    kart = Karts(model="Kart", state=True, tires="Soft", tires_change_date=date(2024, 1, 1), rain=False)
+    idle = Racers(name="No Results", club_card=False, date_of_birth=date(2000, 1, 1),
+                  date_of_registration=date(2024, 1, 1), best_time=time(0, 1, 5))
+    session.add_all([*tracks, *racers, kart, idle])
+    session.flush()
+    races = [Races(track_id=track.id, race_date=date(2025, 6, 1)) for track in tracks]
+    session.add_all(races)
+    session.commit()
+
+    durations = [time(0, 1, 40), time(0, 1, 35), time(0, 1, 45), time(0, 1, 32)]
+    for number, duration in enumerate(durations):
+        req.create_race_racer_kart(Race_Racer_Kart(race_id=races[number % 2].id, racer_id=racers[number // 2].id,
+                                                   kart_id=kart.id, duration=duration), session)
+
+    incremental = snapshot(session)
+    assert session.get(Racers, racers[0].id).best_time == time(0, 1, 35)
+    assert session.get(Racers, racers[1].id).best_time == time(0, 1, 32)
+    assert session.get(Racers, idle.id).best_time == time(0, 1, 5)
+
+    req.rebuild_best_times(session)
+    session.expire_all()
+    assert snapshot(session) == incremental
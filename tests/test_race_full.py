@@ -0,0 +1,78 @@
+"""
+GET /races/{id}/full: число SQL запросов не зависит от числа результатов (нет N+1)
+"""
+from datetime import date, time
+
+import pytest
+from sqlalchemy import event
+
+from model import Karts, Races, Racers, Race_Racer_Kart, Tracks, Workers, Workers_Race
+
+
+def create_race(session, results: int) -> int:
+    """Гонка с results результатами (у каждого свой гонщик и карт) и двумя работниками"""
+    track = Tracks(name="Test Track", state=True, open=True, length=1.2)
+    session.add(track)
+    session.flush()
+    race = Races(track_id=track.id, race_date=date(2025, 6, 1))
+    session.add(race)
+    session.flush()
+    for number in range(results):
+        racer = Racers(name=f"Racer {number}", club_card=False, date_of_birth=date(2000, 1, 1),
+                       date_of_registration=date(2024, 1, 1), best_time=time(0, 2))
+        kart = Karts(model=f"Kart {number}", state=True, tires="Soft",
+                     tires_change_date=date(2025, 1, 1), rain=False)
+        session.add_all([racer, kart])
+        session.flush()
+        session.add(Race_Racer_Kart(race_id=race.id, racer_id=racer.id, kart_id=kart.id,
+                                    duration=time(0, 1, 30 - number % 30)))
+    for number in range(2):
+        worker = Workers(name=f"Worker {number}", date_of_birth=date(1990, 1, 1), status="marshal", salary=50000)
+        session.add(worker)
+        session.flush()
+        session.add(Workers_Race(worker_id=worker.id, race_id=race.id))
+    session.commit()
+    return race.id
+
+
+def count_statements(engine, client, race_id: int) -> int:
+    """Выполнить запрос гонки целиком и вернуть число SQL запросов к БД"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        response = client.get(f"/races/{race_id}/full")
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+    assert response.status_code == 200
+    return len(statements)
+
+
+@pytest.mark.parametrize("results", [1, 10, 50])
+def test_race_full_statement_count_is_constant(engine, session, client, results):
+    race_id = create_race(session, results)
+
+    count = count_statements(engine, client, race_id)
+
+    # Гонка с трассой, результаты с гонщиками и картами, персонал
+    assert count == 3
+
+
+def test_race_full_returns_everything(engine, session, client):
+    race_id = create_race(session, 5)
+
+    detail = client.get(f"/races/{race_id}/full").json()
+
+    assert detail["track"]["name"] == "Test Track"
+    assert len(detail["race_racer_karts"]) == 5
+    assert all(result["racer"] and result["kart"] for result in detail["race_racer_karts"])
+    durations = [result["duration"] for result in detail["race_racer_karts"]]
+    assert durations == sorted(durations)
+    assert len(detail["workers_races"]) == 2
+
+
+def test_race_full_not_found(client):
+    assert client.get("/races/999/full").status_code == 404
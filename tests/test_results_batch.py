@@ -0,0 +1,48 @@
+"""
+Пакетная запись результатов: ошибочные строки попадают в отчет, сохраненные уходят в живой хронометраж с ID
+"""
+from datetime import date, time
+
+from sqlmodel import select
+
+import api
+from model import Karts, Races, Racers, Race_Racer_Kart, Tracks
+
+
+def test_batch_reports_rows_and_publishes_ids(client, session, monkeypatch):
+    track = Tracks(name="Track", state=True, open=True, length=1.0)
+    racer = Racers(name="Racer", club_card=False, date_of_birth=date(2000, 1, 1),
+                   date_of_registration=date(2024, 1, 1), best_time=time(0, 2))
+    kart = Karts(model="Kart", state=True, tires="Soft", tires_change_date=date(2024, 1, 1), rain=False)
+    session.add_all([track, racer, kart])
+    session.flush()
+    race = Races(track_id=track.id, race_date=date(2025, 6, 1))
+    session.add(race)
+    session.commit()
+    published = []
+    monkeypatch.setattr(api.live_hub, "publish", lambda race_id, data: published.append(data))
+
+    result = {"race_id": race.id, "racer_id": racer.id, "kart_id": kart.id}
+    rows = [
+        {**result, "duration": "00:01:31"},
+        "00:01:30",                                   # Не объект
+        {**result, "race_id": race.id + 1, "duration": "00:01:29"},
+        {**result, "duration": "00:01:28"},
+        [race.id, racer.id, kart.id, "00:01:27"],     # Не объект
+    ]
+    response = client.post("/race-results/batch", json=rows)
+
+    assert response.status_code == 200
+    report = response.json()
+    assert report["inserted"] == 2
+    assert [(error["index"], error["detail"]) for error in report["errors"]] == [
+        (1, "Ожидается объект результата"),
+        (2, f"Гонка с ID {race.id + 1} не существует"),
+        (4, "Ожидается объект результата"),
+    ]
+    stored = session.exec(select(Race_Racer_Kart.id, Race_Racer_Kart.duration).order_by(Race_Racer_Kart.id)).all()
+    # ID сохраненных строк в порядке запроса
+    assert [(row["id"], row["duration"]) for row in published] == [
+        (row_id, duration.isoformat()) for row_id, duration in stored
+    ]
+    assert [row["duration"] for row in published] == ["00:01:31", "00:01:28"]
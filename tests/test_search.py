@@ -0,0 +1,66 @@
+"""
+Поиск гонщиков по имени (SQLite, racers_fts): префикс, подстрока, опечатки и перестановки
+"""
+from datetime import date, time
+
+import pytest
+
+import request as req
+from model import Racers
+
+NAMES = [
+    "Ivan Petrov",
+    "Anna Smirnova",
+    "Анна Кузнецова",
+    "Мария Козлова",
+    "Oleg Ivanov",
+    "Petr Sidorov",
+    "Елена Новикова",
+]
+
+
+@pytest.fixture
+def racers(session):
+    session.add_all(
+        Racers(name=name, club_card=False, date_of_birth=date(2000, 1, 1),
+               date_of_registration=date(2024, 1, 1), best_time=time(0, 2))
+        for name in NAMES
+    )
+    session.commit()
+
+
+def search(session, query: str, limit: int = 10) -> list[str]:
+    return [racer.name for racer in req.search_racers(session, query, limit)]
+
+
+def test_prefix_first(session, racers):
+    assert search(session, "iva") == ["Ivan Petrov", "Oleg Ivanov"]
+
+
+def test_substring(session, racers):
+    assert search(session, "кузнец") == ["Анна Кузнецова"]
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("Ivn", "Ivan Petrov"),             # Пропущена буква в коротком запросе
+    ("Кузенцова", "Анна Кузнецова"),    # Перестановка соседних букв
+    ("Petrvo", "Ivan Petrov"),          # Перестановка в конце слова
+    ("Sidrov", "Petr Sidorov"),         # Пропущена буква в фамилии
+    ("Smirnvoa", "Anna Smirnova"),
+    ("Козлава", "Мария Козлова"),       # Замена буквы
+])
+def test_typo(session, racers, query, expected):
+    assert search(session, query)[0] == expected
+
+
+def test_unrelated_query_finds_nothing(session, racers):
+    assert search(session, "Zzyzx") == []
+
+
+def test_short_query_prefix_then_word_start(session, racers):
+    # "Ivan Petrov" начинается с запроса, в "Oleg Ivanov" с него начинается второе слово
+    assert search(session, "iv") == ["Ivan Petrov", "Oleg Ivanov"]
+
+
+def test_short_query_word_start_ignores_case(session, racers):
+    assert search(session, "КО") == ["Мария Козлова"]
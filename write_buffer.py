@@ -0,0 +1,133 @@
+"""
+Групповая запись результатов (режим WRITE_BUFFER)
+
+Результаты из POST /race-results не пишутся каждый своей транзакцией, а ставятся в очередь.
+Фоновый поток забирает из нее до WRITE_BUFFER_BATCH результатов (или сколько накопилось
+за WRITE_BUFFER_DELAY_MS после первого) и записывает их одной транзакцией. Клиент получает
+ответ с ID только после commit своей пачки. Если очередь заполнена, submit сразу
+отказывает (endpoint отвечает 503), при остановке приложения очередь дописывается до конца.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Sequence
+
+from sqlalchemy import Engine
+from sqlmodel import Session
+
+import config
+import request as req
+from model import Race_Racer_Kart, RaceResultBase
+
+_STOP = object()  # Метка остановки в очереди: все, что поставлено до нее, будет записано
+
+
+class RejectedWrite(Exception):
+    """Результат не записан из-за ошибки в данных (несуществующая гонка, гонщик или карт)"""
+
+
+class WriteBuffer:
+    """Очередь результатов и поток, записывающий их пачками"""
+
+    def __init__(self, max_batch: int, max_delay: float, queue_size: int):
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._thread: threading.Thread | None = None
+        self._engine: Engine | None = None
+        self._on_commit: Callable[[Sequence[Race_Racer_Kart]], None] | None = None
+        self.batches = 0
+        self.written = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self, engine: Engine, on_commit: Callable[[Sequence[Race_Racer_Kart]], None] | None = None):
+        """Запустить поток записи (вызывается в lifespan)"""
+        self._engine = engine
+        self._on_commit = on_commit
+        self._thread = threading.Thread(target=self._run, name="write-buffer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Дописать все поставленные в очередь результаты и остановить поток"""
+        if self._thread is None:
+            return
+        thread, self._thread = self._thread, None  # Новые submit больше не принимаются
+        self._queue.put(_STOP)
+        thread.join()
+
+    def submit(self, result: RaceResultBase) -> Future:
+        """
+        Поставить результат в очередь. Future завершится сохраненной строкой Race_Racer_Kart
+        после commit или исключением. queue.Full - очередь заполнена
+        """
+        if self._thread is None:
+            raise RuntimeError("Буфер записи не запущен")
+        future = Future()
+        self._queue.put_nowait((result, future))
+        return future
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._flush(batch)
+
+    def _flush(self, batch: list[tuple[RaceResultBase, Future]]):
+        """Записать пачку одной транзакцией и завершить futures"""
+        try:
+            with Session(self._engine) as session:
+                saved = req.create_race_racer_karts([result for result, _ in batch], session)
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        rows = []
+        for (_, future), row in zip(batch, saved):
+            if isinstance(row, str):
+                future.set_exception(RejectedWrite(row))
+            else:
+                future.set_result(row)
+                rows.append(row)
+        self.batches += 1
+        self.written += len(rows)
+        if rows and self._on_commit is not None:
+            try:
+                self._on_commit(rows)
+            except Exception as e:
+                print(f"==> Ошибка обработчика записи результатов: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "queued": self._queue.qsize(),
+            "batches": self.batches,
+            "written": self.written,
+        }
+
+
+buffer = WriteBuffer(
+    max_batch=config.WRITE_BUFFER_BATCH,
+    max_delay=config.WRITE_BUFFER_DELAY_MS / 1000,
+    queue_size=config.WRITE_BUFFER_QUEUE_SIZE,
+)